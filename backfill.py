@@ -0,0 +1,102 @@
+# backfill.py
+import contextlib
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from models import DailyResult
+from config import MARKETS, BAR_STORE_ENABLED, BACKFILL_LEAD_DAYS, HISTORY_ENABLED
+from bar_store import get_bar_store
+from data_fetchers import fetch_yf_history, fetch_ak_index, fetch_crypto_daily_range
+from processor import compute_session_stats, open_source_pools, post_process
+from reporter import render_report, ReportSink
+from utils import format_date_display, get_latest_completed_session, start_run_deadline
+
+
+def _opt(v) -> Optional[float]:
+    return None if pd.isna(v) else float(v)
+
+
+def _load_range(name: str, cfg: Dict, start: date, end: date) -> Optional[pd.DataFrame]:
+    source = cfg["source"]
+    if source == "binance":
+        return fetch_crypto_daily_range(cfg["symbol"], name, start, end)
+
+    # 向前多取几天，保证 start 当天也有前一交易日收盘作为基准
+    fetch_start = start - timedelta(days=BACKFILL_LEAD_DAYS)
+    if source == "yf":
+        df = fetch_yf_history(cfg["symbol"], start=fetch_start)
+    else:
+        df = fetch_ak_index(cfg["ak_symbol"], "ak_hk" if source == "ak_hk" else "ak")
+
+    if not BAR_STORE_ENABLED:
+        return df
+    key = cfg.get("symbol") or cfg["ak_symbol"]
+    store = get_bar_store()
+    if df is not None:
+        store.upsert(source, key, "1d", df, through=get_latest_completed_session(cfg.get("calendar"), source))
+    # 上游失败时仍可用本地缓存回填
+    return store.load(source, key, "1d")
+
+
+def _backfill_one(name: str, cfg: Dict, start: date, end: date) -> List[DailyResult]:
+    print(f"\n回填中：{name}")
+    df = _load_range(name, cfg, start, end)
+    if df is None or df.empty:
+        print(f"  → {name} 无可用数据")
+        return []
+
+    completed_date = get_latest_completed_session(cfg.get("calendar"), cfg["source"])
+    if cfg["source"] != "binance" and completed_date is not None:
+        df = df[df.index.date <= completed_date]
+
+    stats = compute_session_stats(df, cfg["type"])
+    session_dates = stats.index.date
+    stats = stats[(session_dates >= start) & (session_dates <= end) & stats["high_pct"].notna()]
+
+    # 回填只使用日线，不包含日内极值时间
+    return [
+        DailyResult(
+            name=name,
+            high=_opt(row.High), high_time="", high_pct=_opt(row.high_pct),
+            low=_opt(row.Low), low_time="", low_pct=_opt(row.low_pct),
+            close=_opt(row.Close), close_pct=_opt(row.close_pct),
+            amplitude_pct=_opt(row.amplitude_pct),
+            result_type=cfg["type"],
+            date_str=format_date_display(ts.date()),
+        )
+        for ts, row in zip(stats.index, stats.itertuples(index=False))
+    ]
+
+
+def collect_backfill(start: date, end: date, markets: Optional[Dict[str, Dict]] = None) -> List[DailyResult]:
+    markets = MARKETS if markets is None else markets
+    start_run_deadline()
+    # 与 collect_data 相同，每个数据源使用各自的有界线程池
+    with contextlib.ExitStack() as stack:
+        pools = open_source_pools(stack, markets)
+        futures = [pools[cfg["source"]].submit(_backfill_one, name, cfg, start, end)
+                   for name, cfg in markets.items()]
+        return [r for f in futures for r in f.result()]
+
+
+def run_backfill(start: date, end: date, sinks: Optional[List[ReportSink]] = None,
+                 markets: Optional[Dict[str, Dict]] = None):
+    """回填 [start, end] 内的每个交易日，每个交易日向各输出端输出一份日报。
+
+    按日期顺序写入结果历史，回填同时为滚动统计预热。
+    JSON 输出端因此每个交易日写一行 JSON 文档（JSON Lines）。
+    """
+    markets = MARKETS if markets is None else markets
+    results = collect_backfill(start, end, markets)
+    by_date = sorted(results, key=lambda r: r.date_str)
+    history = None
+    if HISTORY_ENABLED:
+        from result_history import get_result_history, history_keys
+        history, keys = get_result_history(), history_keys(markets)
+    for _, group in groupby(by_date, key=lambda r: r.date_str):
+        ordered = post_process(list(group))
+        rolling = history.update(ordered, keys) if history else None
+        render_report(ordered, None, None, sinks=sinks, markets=markets, rolling=rolling)
@@ -0,0 +1,104 @@
+# bar_store.py
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+
+from config import BAR_STORE_PATH
+
+_COLUMNS = ["Open", "High", "Low", "Close", "Dividends"]
+
+
+class BarStore:
+    """本地 K 线缓存，按 (source, symbol, interval) 存储，每根 K 线以时间戳去重。"""
+
+    def __init__(self, path: str = BAR_STORE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bars (
+                    source    TEXT NOT NULL,
+                    symbol    TEXT NOT NULL,
+                    interval  TEXT NOT NULL,
+                    ts        TEXT NOT NULL,
+                    open      REAL,
+                    high      REAL,
+                    low       REAL,
+                    close     REAL,
+                    dividends REAL DEFAULT 0,
+                    PRIMARY KEY (source, symbol, interval, ts)
+                )
+                """
+            )
+
+    def load(self, source: str, symbol: str, interval: str = "1d", limit: Optional[int] = None
+             ) -> Optional[pd.DataFrame]:
+        sql = ("SELECT ts, open, high, low, close, dividends FROM bars "
+               "WHERE source = ? AND symbol = ? AND interval = ? ORDER BY ts DESC")
+        params = [source, symbol, interval]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if not rows:
+            return None
+        df = pd.DataFrame(rows, columns=["date"] + _COLUMNS)
+        df["date"] = pd.to_datetime(df["date"])
+        return df.set_index("date").sort_index()
+
+    def upsert(self, source: str, symbol: str, interval: str, df: pd.DataFrame,
+               through: Optional[date] = None) -> int:
+        """合并新 K 线：同一时间戳以新数据覆盖旧数据。
+
+        盘中请求会返回未完成的当日 K 线，给定 through（最新已完成交易日）时只写入该日及之前的 K 线，
+        否则收盘后缓存会被误认为已是最新，盘中快照被当作最终结果。
+        """
+        if df is None or df.empty:
+            return 0
+        if through is not None:
+            df = df[pd.DatetimeIndex(df.index).date <= through]
+            if df.empty:
+                return 0
+        df = df.copy()
+        if "Dividends" not in df.columns:
+            df["Dividends"] = 0.0
+        df["Dividends"] = df["Dividends"].fillna(0.0)
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            # 日线只关心交易日，去掉时区保留本地日期
+            index = index.tz_localize(None)
+        rows = [
+            (source, symbol, interval, ts.isoformat(),
+             float(r.Open), float(r.High), float(r.Low), float(r.Close), float(r.Dividends))
+            for ts, r in zip(index, df[_COLUMNS].itertuples(index=False))
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_store: Optional[BarStore] = None
+_default_lock = threading.Lock()
+
+
+def get_bar_store() -> BarStore:
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = BarStore()
+        return _default_store
@@ -0,0 +1,188 @@
+# benchmark.py
+"""离线基准测试：在回放模式下分别计时 collect_data / get_latest_day_data / post_process / render_report。
+
+示例：
+    python benchmark.py                        # 使用合成数据，真实 MARKETS
+    python benchmark.py --scale 500            # 追加 500 个合成标的
+    python benchmark.py --latency 0.05 --failure-rate 0.1
+    DAILYREPORT_FETCH_MODE=record python 日报.py   # 先录制一份真实 fixture，再用 --fixtures 回放
+"""
+import argparse
+import atexit
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time as time_module
+from datetime import datetime
+from typing import Callable, Dict, List
+
+# 基准测试需要每次都走完整获取流程，不能被本地日线/分钟线缓存短路；
+# 合成数据一律写入临时目录，不能污染真实 data/（否则之后的真实运行会读到合成 K 线和耗时统计）
+os.environ.setdefault("DAILYREPORT_BAR_STORE", "0")
+os.environ.setdefault("DAILYREPORT_MINUTE_STORE", "0")
+os.environ["DAILYREPORT_DATA_DIR"] = tempfile.mkdtemp(prefix="dailyreport-bench-")
+atexit.register(shutil.rmtree, os.environ["DAILYREPORT_DATA_DIR"], True)
+
+import numpy as np
+import pandas as pd
+
+import replay
+from config import MARKETS, FIXTURE_DIR
+from processor import collect_data, get_latest_day_data, post_process
+from reporter import render_report
+from utils import get_latest_completed_session
+
+
+def _rng(*key) -> np.random.Generator:
+    seed = int(hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:8], 16)
+    return np.random.default_rng(seed)
+
+
+def _synthetic_daily(symbol: str, periods: int = 60) -> pd.DataFrame:
+    rng = _rng("1d", symbol)
+    end = pd.Timestamp.now(tz="UTC").tz_localize(None).normalize() - pd.Timedelta(days=1)
+    index = pd.bdate_range(end=end, periods=periods)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+    open_ = close * (1 + rng.normal(0, 0.003, periods))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, periods))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, periods))
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Dividends": 0.0},
+                        index=index)
+
+
+def _synthetic_minutes(symbol: str, tz: str, days: int = 5) -> pd.DataFrame:
+    rng = _rng("1m", symbol)
+    end = pd.Timestamp.now(tz=tz).normalize() - pd.Timedelta(days=1)
+    sessions = pd.bdate_range(end=end.tz_localize(None), periods=days)
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(f"{d.date()} 09:30", f"{d.date()} 15:59", freq="1min", tz=tz).values
+        for d in sessions
+    ])).tz_localize("UTC").tz_convert(tz)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, len(index))))
+    return pd.DataFrame({"Open": close, "High": close * 1.0005, "Low": close * 0.9995, "Close": close},
+                        index=index)
+
+
+def _synthetic_extreme_time(*key) -> tuple:
+    rng = _rng("extreme", *key)
+    high_m, low_m = rng.integers(0, 24 * 60, 2)
+    return f"{high_m // 60:02d}:{high_m % 60:02d}", f"{low_m // 60:02d}:{low_m % 60:02d}"
+
+
+def synthetic_provider(func_name: str, args: tuple, kwargs: dict):
+    """fixture 缺失时按函数签名生成确定性的合成数据。"""
+    def _from(df: pd.DataFrame, start) -> pd.DataFrame:
+        return df[df.index.date >= start] if start else df
+
+    if func_name == "fetch_yf_history":
+        return _from(_synthetic_daily(args[0]), kwargs.get("start"))
+    if func_name == "fetch_yf_history_batch":
+        return {s: _from(_synthetic_daily(s), kwargs.get("start")) for s in args[0]}
+    if func_name == "fetch_stock_1m_batch":
+        tz = kwargs.get("tz", "America/New_York")
+        return {s: _synthetic_minutes(s, tz) for s in args[0]}
+    if func_name == "fetch_ak_index":
+        return _synthetic_daily(args[0])
+    if func_name in ("fetch_stock_1m_high_low_time", "fetch_crypto_high_low_time"):
+        return (*_synthetic_extreme_time(func_name, *args), True)
+    if func_name == "fetch_crypto_daily":
+        last = _synthetic_daily(args[0], periods=3).iloc[-1]
+        dt = (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=1)).date()
+        return dt, round(last["Open"], 2), round(last["High"], 2), round(last["Low"], 2), round(last["Close"], 2)
+    if func_name == "fetch_crypto_daily_range":
+        df = _synthetic_daily(args[0], periods=400)
+        return df[(df.index.date >= args[2]) & (df.index.date <= args[3])][["Open", "High", "Low", "Close"]]
+    raise KeyError(func_name)
+
+
+def build_synthetic_markets(scale: int) -> Dict[str, Dict]:
+    """在真实 MARKETS 之后追加 scale 个合成标的，数据源与类型按真实配置轮换。"""
+    markets = dict(MARKETS)
+    templates = list(MARKETS.values())
+    for i in range(scale):
+        cfg = dict(templates[i % len(templates)])
+        name = f"{cfg['name']}#{i}"
+        cfg["name"] = name
+        if "symbol" in cfg:
+            cfg["symbol"] = f"SYN{i}/USDT" if cfg["source"] == "binance" else f"SYN{i}"
+        if "ak_symbol" in cfg:
+            cfg["ak_symbol"] = f"SYN{i}"
+        markets[name] = cfg
+    return markets
+
+
+def _time(func: Callable, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time_module.perf_counter()
+        func()
+        timings.append(time_module.perf_counter() - start)
+    return timings
+
+
+def run_benchmark(scale: int, repeat: int) -> Dict[str, List[float]]:
+    markets = build_synthetic_markets(scale)
+    timings = {}
+    # 临时目录中没有日历快照，先构建好，避免首轮计时包含构建耗时
+    for calendar in {cfg.get("calendar") for cfg in markets.values()}:
+        get_latest_completed_session(calendar, "yf")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = {}
+
+        def _collect():
+            state["results"], state["crypto_date"], state["us_date"] = collect_data(markets)
+        timings["collect_data"] = _time(_collect, repeat)
+
+        frames = [(synthetic_provider("fetch_ak_index", (cfg.get("symbol") or cfg["ak_symbol"],), {}), cfg)
+                  for cfg in markets.values() if cfg["source"] != "binance"]
+        timings["get_latest_day_data"] = _time(
+            lambda: [get_latest_day_data(df, cfg.get("calendar"), cfg["source"], cfg["type"])
+                     for df, cfg in frames],
+            repeat,
+        )
+
+        timings["post_process"] = _time(lambda: state.update(ordered=post_process(state["results"])), repeat)
+        timings["render_report"] = _time(
+            lambda: render_report(state["ordered"], state["crypto_date"], state["us_date"], markets=markets), repeat
+        )
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日报流水线离线基准测试")
+    parser.add_argument("--scale", type=int, default=0, help="追加的合成标的数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次回放请求的固定延迟（秒）")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="每次回放请求额外的随机延迟上限（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="回放请求的模拟失败概率")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="fixture 目录，缺失的调用由合成数据补齐")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把原始计时结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    replay.configure(mode="replay", fixture_dir=args.fixtures, latency=args.latency,
+                     latency_jitter=args.latency_jitter, failure_rate=args.failure_rate,
+                     provider=synthetic_provider, seed=args.seed)
+
+    timings = run_benchmark(args.scale, args.repeat)
+
+    print(f"标的数：{len(MARKETS) + args.scale}，重复 {args.repeat} 次")
+    print(f"{'阶段':<22}{'最小(ms)':>12}{'中位(ms)':>12}{'最大(ms)':>12}")
+    for stage, values in timings.items():
+        ms = [v * 1000 for v in values]
+        print(f"{stage:<22}{min(ms):>12.2f}{statistics.median(ms):>12.2f}{max(ms):>12.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"scale": args.scale, "repeat": args.repeat, "timings": timings,
+                       "generated_at": datetime.now().isoformat()}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# binance_client.py
+import threading
+import time as time_module
+from typing import List, Optional
+
+from config import BINANCE_WEIGHT_LIMIT_1M
+
+
+class BinanceClient:
+    """进程内共享的 Binance 客户端。
+
+    所有加密货币请求复用同一个 ccxt 实例（同一个 HTTP 会话、同一份市场元数据和限速状态），
+    并根据响应头 x-mbx-used-weight-1m 统计所有交易对合计消耗的请求权重。
+    """
+
+    def __init__(self, weight_limit: int = BINANCE_WEIGHT_LIMIT_1M):
+        import ccxt  # 延迟导入，未用到加密货币时不加载 ccxt
+        self.exchange = ccxt.binance({'enableRateLimit': True})
+        self.weight_limit = weight_limit
+        self.used_weight = 0
+        # ccxt 同步实例不是线程安全的，请求串行经过这把锁
+        self._lock = threading.Lock()
+        self._markets_loaded = False
+
+    def _ensure_markets(self):
+        if not self._markets_loaded:
+            self.exchange.load_markets()
+            self._markets_loaded = True
+
+    def _wait_for_weight(self):
+        # 权重按自然分钟重置，接近上限时等到下一分钟再发请求
+        if self.used_weight < self.weight_limit:
+            return
+        sleep_time = 60 - time_module.time() % 60 + 1
+        print(f"    Binance 权重已用 {self.used_weight}/{self.weight_limit}，等待 {sleep_time:.0f} 秒...")
+        time_module.sleep(sleep_time)
+        self.used_weight = 0
+
+    def _record_weight(self):
+        headers = self.exchange.last_response_headers or {}
+        used = headers.get("x-mbx-used-weight-1m") or headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is not None:
+            self.used_weight = int(used)
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None,
+                    limit: Optional[int] = None) -> List[list]:
+        with self._lock:
+            self._ensure_markets()
+            self._wait_for_weight()
+            try:
+                return self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+            finally:
+                self._record_weight()
+
+
+_client: Optional[BinanceClient] = None
+_client_lock = threading.Lock()
+
+
+def get_binance_client() -> BinanceClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = BinanceClient()
+        return _client
@@ -1,6 +1,10 @@
 # config.py
+import os
 from typing import Dict
 
+# 本地数据目录（日线/分钟线缓存、日历快照、流式聚合、结果历史等），基准测试等离线运行可指向临时目录
+DATA_DIR = os.environ.get("DAILYREPORT_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
 DISPLAY_ORDER = [
     "QQQ", "SPY", "DIA",
     "BTC", "ETH",
@@ -9,21 +13,28 @@ DISPLAY_ORDER = [
 ]
 
 MARKETS: Dict[str, Dict] = {
-    "纳指": {"name": "纳指", "type": "index", "symbol": "^IXIC", "source": "yf", "calendar": "XNYS"},
-    "SPX": {"name": "SPX", "type": "index", "symbol": "^GSPC", "source": "yf", "calendar": "XNYS"},
-    "道指": {"name": "道指", "type": "index", "symbol": "^DJI", "source": "yf", "calendar": "XNYS"},
-    "罗素2000": {"name": "罗素2000", "type": "index", "symbol": "^RUT", "source": "yf", "calendar": "XNYS"},
-    "日经": {"name": "日经", "type": "index", "ak_symbol": "日经225", "source": "ak", "calendar": "XTKS"},
-    "恒科": {"name": "恒科", "type": "index", "ak_symbol": "HSTECH", "source": "ak_hk", "calendar": "XHKG"},
-    "恒生": {"name": "恒生", "type": "index", "ak_symbol": "恒生指数", "source": "ak", "calendar": "XHKG"},
-    "上证": {"name": "上证", "type": "index", "symbol": "000001.SS", "source": "yf", "calendar": "XSHG"},
+    "纳指": {"name": "纳指", "type": "index", "symbol": "^IXIC", "source": "yf", "calendar": "XNYS", "region": "us"},
+    "SPX": {"name": "SPX", "type": "index", "symbol": "^GSPC", "source": "yf", "calendar": "XNYS", "region": "us"},
+    "道指": {"name": "道指", "type": "index", "symbol": "^DJI", "source": "yf", "calendar": "XNYS", "region": "us"},
+    "罗素2000": {"name": "罗素2000", "type": "index", "symbol": "^RUT", "source": "yf", "calendar": "XNYS", "region": "us"},
+    "日经": {"name": "日经", "type": "index", "ak_symbol": "日经225", "source": "ak", "calendar": "XTKS", "region": "asia", "backups": [{"source": "yf", "symbol": "^N225"}]},
+    "恒科": {"name": "恒科", "type": "index", "ak_symbol": "HSTECH", "source": "ak_hk", "calendar": "XHKG", "region": "asia"},
+    "恒生": {"name": "恒生", "type": "index", "ak_symbol": "恒生指数", "source": "ak", "calendar": "XHKG", "region": "asia", "backups": [{"source": "yf", "symbol": "^HSI"}]},
+    "上证": {"name": "上证", "type": "index", "symbol": "000001.SS", "source": "yf", "calendar": "XSHG", "region": "asia", "backups": [{"source": "ak", "ak_symbol": "上证指数"}]},
+
+    "SPY": {"name": "SPY", "type": "stock", "symbol": "SPY", "source": "yf", "calendar": "XNYS", "region": "us"},
+    "QQQ": {"name": "QQQ", "type": "stock", "symbol": "QQQ", "source": "yf", "calendar": "XNYS", "region": "us"},
+    "DIA": {"name": "DIA", "type": "stock", "symbol": "DIA", "source": "yf", "calendar": "XNYS", "region": "us"},
 
-    "SPY": {"name": "SPY", "type": "stock", "symbol": "SPY", "source": "yf", "calendar": "XNYS"},
-    "QQQ": {"name": "QQQ", "type": "stock", "symbol": "QQQ", "source": "yf", "calendar": "XNYS"},
-    "DIA": {"name": "DIA", "type": "stock", "symbol": "DIA", "source": "yf", "calendar": "XNYS"},
+    "BTC": {"name": "BTC", "type": "crypto", "symbol": "BTC/USDT", "source": "binance", "region": "crypto"},
+    "ETH": {"name": "ETH", "type": "crypto", "symbol": "ETH/USDT", "source": "binance", "region": "crypto"},
+}
 
-    "BTC": {"name": "BTC", "type": "crypto", "symbol": "BTC/USDT", "source": "binance"},
-    "ETH": {"name": "ETH", "type": "crypto", "symbol": "ETH/USDT", "source": "binance"},
+# 日报中的地区分组，按此顺序输出；unit / time_prefix 按标的 type 取值
+REGIONS: Dict[str, Dict] = {
+    "us": {"title": "美国市场", "unit": {"stock": "美元"}, "time_prefix": {"stock": "美东时间", "index": "美东时间"}},
+    "crypto": {"title": "加密货币", "unit": {"crypto": "美元"}, "time_prefix": {"crypto": "北京时间"}},
+    "asia": {"title": "亚洲市场", "unit": {}, "time_prefix": {}},
 }
 
 CALENDAR_TIMEZONES = {
@@ -33,9 +44,132 @@ CALENDAR_TIMEZONES = {
     "XTKS": "Asia/Tokyo",
 }
 
+# 地区未配置 time_prefix 时（如亚洲市场各交易所时区不同），日内时间按标的日历标注
+CALENDAR_TIME_LABELS = {
+    "XNYS": "美东时间",
+    "XHKG": "香港时间",
+    "XSHG": "北京时间",
+    "XTKS": "东京时间",
+}
+
 CLOSE_BUFFER_MINUTES = {
     "yf": 20,
     "ak": 20,
     "ak_hk": 20,
     "binance": 0,
-}
\ No newline at end of file
+}
+
+# 每个数据源的最大并发请求数，避免单一上游被打爆
+SOURCE_CONCURRENCY = {
+    "yf": 4,
+    "ak": 2,
+    "ak_hk": 2,
+    "binance": 2,
+}
+
+DEFAULT_SOURCE_CONCURRENCY = 2
+
+# 单个线程池的线程数上限（collect_data 与回填中每个数据源各自一个线程池）
+MAX_FETCH_WORKERS = 8
+
+# yf 标的是否先按周期批量下载（日线一次、分钟线一次），失败的标的再逐个补拉
+YF_BATCH_DOWNLOAD = True
+
+# 本地日线缓存：已缓存到最新完成交易日的标的不再请求上游，yf 只增量拉取缓存之后的 K 线
+BAR_STORE_ENABLED = os.environ.get("DAILYREPORT_BAR_STORE", "1") != "0"
+BAR_STORE_PATH = os.path.join(DATA_DIR, "bars.sqlite")
+# 增量拉取时向前多取的天数，用于覆盖可能未完成或被修正的最后几根 K 线
+BAR_STORE_OVERLAP_DAYS = 3
+# 从缓存读出给 get_latest_day_data 使用的最大行数
+BAR_STORE_LOAD_ROWS = 60
+
+# Binance 每分钟请求权重的软上限（官方硬上限更高），所有交易对共用
+BINANCE_WEIGHT_LIMIT_1M = 1000
+
+# 加密货币日内极值时间的查找方式："coarse" 先用 1h K 线定位再取 1m，"full" 直接扫描全天 1440 根 1m K 线
+CRYPTO_EXTREME_SEARCH = "coarse"
+
+# 交易日历快照：按日历缓存一段时间窗口内的交易日与收盘时间，避免每次启动都构建 exchange_calendars 对象
+CALENDAR_SNAPSHOT_DIR = os.path.join(DATA_DIR, "calendars")
+CALENDAR_SNAPSHOT_TTL_DAYS = 7
+CALENDAR_SNAPSHOT_LOOKBACK_DAYS = 30
+CALENDAR_SNAPSHOT_LOOKAHEAD_DAYS = 60
+
+# 重试与熔断：整次运行的总时限、单次获取的时间预算、指数退避参数
+RUN_DEADLINE_SECONDS = 300
+FETCH_TIME_BUDGET_SECONDS = 20
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 8.0
+# 同一数据源连续失败次数达到阈值后熔断，冷却期内该源剩余标的直接标记为 stale
+CIRCUIT_FAILURE_THRESHOLD = 6
+CIRCUIT_COOLDOWN_SECONDS = 300
+
+# 回填模式向 start 之前多取的自然日数，保证首个交易日有前收盘
+BACKFILL_LEAD_DAYS = 10
+
+# 数据获取模式：live 直连上游；record 直连并录制到 FIXTURE_DIR；replay 只从 FIXTURE_DIR 回放（离线）
+FETCH_MODE = os.environ.get("DAILYREPORT_FETCH_MODE", "live")
+FIXTURE_DIR = os.environ.get(
+    "DAILYREPORT_FIXTURE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"),
+)
+
+# 运行指标输出路径（为空则不输出）：JSON lines 追加写入，Prometheus textfile 每次覆盖
+METRICS_JSONL_PATH = os.environ.get("DAILYREPORT_METRICS_JSONL", "")
+METRICS_PROM_PATH = os.environ.get("DAILYREPORT_METRICS_PROM", "")
+
+# 常驻模式下单次睡眠的最长时间（秒），到点前分段等待
+DAEMON_MAX_SLEEP_SECONDS = 60
+# 常驻模式下加密货币在 UTC 0 点后延迟触发：00:00 的 1m K 线约 00:01 才收盘，流式聚合此时才完成前一日，
+# Binance 新日线也需要片刻才出现
+DAEMON_CRYPTO_DELAY_MINUTES = 3
+
+# 加密货币流式聚合：开启后 collect_data 优先读取流式检查点中已完成的交易日，缺失或不完整时再走 REST
+CRYPTO_STREAM_ENABLED = os.environ.get("DAILYREPORT_CRYPTO_STREAM", "0") == "1"
+CRYPTO_STREAM_DIR = os.path.join(DATA_DIR, "stream")
+CRYPTO_STREAM_CHECKPOINT_SECONDS = 60
+CRYPTO_STREAM_KEEP_DAYS = 7
+
+# 分钟线存储：yf 标的（含指数）的 1m K 线按交易日落盘复用，用于计算日内最高/最低时间
+MINUTE_STORE_ENABLED = os.environ.get("DAILYREPORT_MINUTE_STORE", "1") != "0"
+MINUTE_STORE_DIR = os.path.join(DATA_DIR, "minutes")
+# 各交易所常规交易时段（本地时间），用于剔除盘前盘后分钟线
+MINUTE_SESSION_HOURS = {
+    "XNYS": ("09:30", "16:00"),
+    "XSHG": ("09:30", "15:00"),
+    "XHKG": ("09:30", "16:00"),
+    "XTKS": ("09:00", "15:30"),
+}
+# 午休时段（本地时间，[起, 止)），其间没有分钟线，不计入缺失
+MINUTE_SESSION_BREAKS = {
+    "XSHG": [("11:30", "13:00")],
+    "XHKG": [("12:00", "13:00")],
+    "XTKS": [("11:30", "12:30")],
+}
+
+# 分钟线缺口补拉：最多补拉轮数、每个区间请求的重试次数；缺失比例不超过阈值视为完整（与原 1380/1440 一致）
+MINUTE_GAP_MAX_ROUNDS = 3
+MINUTE_RANGE_MAX_RETRIES = 2
+MINUTE_MAX_MISSING_RATIO = 1 / 24
+
+# 结果历史与滚动统计：5/20 日平均振幅、20 日新高/新低、连涨连跌天数
+HISTORY_ENABLED = os.environ.get("DAILYREPORT_HISTORY", "1") != "0"
+HISTORY_PATH = os.path.join(DATA_DIR, "history.sqlite")
+AMPLITUDE_WINDOWS = (5, 20)
+EXTREME_WINDOW = 20
+
+# 多份日报档案：名称 → {"markets": MARKETS 中的名称列表或完整配置字典, "display_order": 显示顺序,
+# "outputs": [("md", "reports/us.md"), ...]}。通过 --report-profiles 一次运行全部档案，相同标的只获取一次
+REPORT_PROFILES: Dict[str, Dict] = {}
+
+# 对冲请求：配置了 backups 的标的，首选源在延迟阈值内未返回有效数据时并行请求备用源，先返回者胜出
+HEDGE_ENABLED = os.environ.get("DAILYREPORT_HEDGE", "1") != "0"
+# 延迟阈值取首选源近期耗时的 HEDGE_DELAY_QUANTILE 分位，并限制在 [MIN, MAX] 内；样本不足时用 DEFAULT
+HEDGE_DELAY_QUANTILE = 0.9
+HEDGE_MIN_DELAY_SECONDS = 1.0
+HEDGE_MAX_DELAY_SECONDS = 8.0
+HEDGE_DEFAULT_DELAY_SECONDS = 3.0
+# 各数据源滚动耗时统计：保留最近 N 次，样本数达到 MIN_SAMPLES 后才参与排序和阈值计算
+SOURCE_LATENCY_WINDOW = 50
+SOURCE_LATENCY_MIN_SAMPLES = 5
+SOURCE_LATENCY_PATH = os.path.join(DATA_DIR, "source_latency.json")
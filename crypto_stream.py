@@ -0,0 +1,179 @@
+# crypto_stream.py
+import json
+import os
+import time as time_module
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pytz
+
+from config import MARKETS, CRYPTO_STREAM_DIR, CRYPTO_STREAM_CHECKPOINT_SECONDS, CRYPTO_STREAM_KEEP_DAYS
+
+DAY_MS = 86400000
+MINUTE_MS = 60000
+# 日线 OHLC 直接取自流式聚合，必须一根不缺；缺分钟时最高/最低可能漏掉真实极值、收盘也可能不是最后一分钟
+DAY_MINUTES = DAY_MS // MINUTE_MS
+
+# 行情事件：(交易对, 1m K 线开盘时间 ms, open, high, low, close)，只包含已收盘的 K 线
+KlineEvent = Tuple[str, int, float, float, float, float]
+
+
+class DayAggregator:
+    """单个交易对当前 UTC 日的滚动 OHLC 及最高/最低点首次出现的分钟。"""
+
+    def __init__(self, symbol: str, state: Optional[Dict] = None):
+        self.symbol = symbol
+        self.state = state
+
+    def update(self, ts: int, o: float, h: float, l: float, c: float) -> Optional[Dict]:
+        """吸收一根已收盘的 1m K 线；跨日时返回上一日的最终结果。"""
+        day_start = ts - ts % DAY_MS
+        finished = None
+        if self.state is not None and self.state["day_start"] != day_start:
+            if day_start < self.state["day_start"]:
+                return None  # 迟到的旧数据
+            finished, self.state = self.state, None
+
+        s = self.state
+        if s is None:
+            self.state = {"day_start": day_start, "first_ts": ts, "last_ts": ts, "minutes": 1,
+                          "open": o, "high": h, "low": l, "close": c, "high_ts": ts, "low_ts": ts}
+            return finished
+
+        if ts <= s["last_ts"]:
+            return finished  # 重连后重复推送的 K 线
+        s["minutes"] += 1
+        s["last_ts"] = ts
+        s["close"] = c
+        # 严格大于/小于，保留极值首次出现的分钟，与对分钟线 idxmax/idxmin 的结果一致
+        if h > s["high"]:
+            s["high"], s["high_ts"] = h, ts
+        if l < s["low"]:
+            s["low"], s["low_ts"] = l, ts
+        return finished
+
+
+def _safe_name(symbol: str) -> str:
+    return symbol.replace("/", "_")
+
+
+def _checkpoint_path(symbol: str) -> str:
+    return os.path.join(CRYPTO_STREAM_DIR, f"{_safe_name(symbol)}.json")
+
+
+def _read_checkpoint(symbol: str) -> Dict:
+    try:
+        with open(_checkpoint_path(symbol), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"current": None, "days": {}}
+
+
+def _write_checkpoint(symbol: str, checkpoint: Dict):
+    os.makedirs(CRYPTO_STREAM_DIR, exist_ok=True)
+    path = _checkpoint_path(symbol)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+class StreamAggregator:
+    """消费行情源，维护每个交易对的当日聚合，并定期把进度和已完成的交易日写入检查点。"""
+
+    def __init__(self, symbols: List[str], checkpoint_seconds: float = CRYPTO_STREAM_CHECKPOINT_SECONDS):
+        self.checkpoint_seconds = checkpoint_seconds
+        self.checkpoints = {symbol: _read_checkpoint(symbol) for symbol in symbols}
+        self.aggregators = {symbol: DayAggregator(symbol, self.checkpoints[symbol].get("current"))
+                            for symbol in symbols}
+        self._last_flush = time_module.monotonic()
+
+    def on_kline(self, symbol: str, ts: int, o: float, h: float, l: float, c: float):
+        aggregator = self.aggregators.get(symbol)
+        if aggregator is None:
+            return
+        finished = aggregator.update(ts, o, h, l, c)
+        checkpoint = self.checkpoints[symbol]
+        if finished is not None:
+            day = datetime.fromtimestamp(finished["day_start"] / 1000, tz=pytz.UTC).date().isoformat()
+            checkpoint["days"][day] = finished
+            for old in sorted(checkpoint["days"])[:-CRYPTO_STREAM_KEEP_DAYS]:
+                del checkpoint["days"][old]
+            print(f"→ {symbol} {day} 流式聚合完成（{finished['minutes']} 根 1m K 线）")
+        checkpoint["current"] = aggregator.state
+        # 跨日时立即落盘，保证日报运行时能读到刚结束的交易日
+        if finished is not None or time_module.monotonic() - self._last_flush >= self.checkpoint_seconds:
+            self.flush()
+
+    def flush(self):
+        for symbol, checkpoint in self.checkpoints.items():
+            _write_checkpoint(symbol, checkpoint)
+        self._last_flush = time_module.monotonic()
+
+    def run(self, feed: Iterable[KlineEvent]):
+        try:
+            for event in feed:
+                self.on_kline(*event)
+        finally:
+            self.flush()
+
+
+def binance_kline_feed(symbols: List[str], reconnect_delay: float = 5.0) -> Iterator[KlineEvent]:
+    """Binance 1m K 线 WebSocket 行情源（需要 websocket-client），断线后自动重连。"""
+    import websocket  # 延迟导入，仅流式模式需要
+
+    by_stream = {s.replace("/", "").lower(): s for s in symbols}
+    url = "wss://stream.binance.com:9443/stream?streams=" + "/".join(f"{s}@kline_1m" for s in by_stream)
+    while True:
+        ws = None
+        try:
+            ws = websocket.create_connection(url, timeout=60)
+            while True:
+                message = json.loads(ws.recv())
+                data = message.get("data", {})
+                kline = data.get("k")
+                if not kline or not kline.get("x"):
+                    continue  # 只使用已收盘的 K 线，与 REST 1m K 线口径一致
+                symbol = by_stream.get(kline["s"].lower())
+                if symbol:
+                    yield (symbol, int(kline["t"]), float(kline["o"]), float(kline["h"]),
+                           float(kline["l"]), float(kline["c"]))
+        except Exception as e:
+            print(f"  → Binance 行情连接中断: {type(e).__name__}: {e}，{reconnect_delay:.0f} 秒后重连")
+            time_module.sleep(reconnect_delay)
+        finally:
+            if ws is not None:
+                ws.close()
+
+
+def simulated_feed(klines: Dict[str, List[list]]) -> Iterator[KlineEvent]:
+    """由 ccxt 格式的 1m K 线（[ts, o, h, l, c, v]）按时间顺序回放的本地行情源，用于测试。"""
+    events = [(symbol, int(k[0]), k[1], k[2], k[3], k[4]) for symbol, rows in klines.items() for k in rows]
+    yield from sorted(events, key=lambda e: e[1])
+
+
+def load_streamed_day(symbol: str, day: date) -> Optional[Tuple[date, float, float, float, float, str, str]]:
+    """读取检查点中已完成的交易日，返回 (日期, 开, 高, 低, 收, 最高时间, 最低时间)。
+
+    只有 1440 根 1m K 线齐全时才返回，否则返回 None，由调用方退回 REST 日线（OHLC 精确）。
+    """
+    checkpoint = _read_checkpoint(symbol)
+    state = checkpoint["days"].get(day.isoformat())
+    if state is None:
+        return None
+    if (state["first_ts"] != state["day_start"]
+            or state["last_ts"] != state["day_start"] + DAY_MS - MINUTE_MS
+            or state["minutes"] != DAY_MINUTES):
+        return None
+
+    tz = pytz.timezone("Asia/Shanghai")
+    high_t = datetime.fromtimestamp(state["high_ts"] / 1000, tz=tz).strftime("%H:%M")
+    low_t = datetime.fromtimestamp(state["low_ts"] / 1000, tz=tz).strftime("%H:%M")
+    return (day, round(state["open"], 2), round(state["high"], 2), round(state["low"], 2),
+            round(state["close"], 2), high_t, low_t)
+
+
+def run_stream(markets: Optional[Dict[str, Dict]] = None, feed: Optional[Iterable[KlineEvent]] = None):
+    markets = MARKETS if markets is None else markets
+    symbols = [cfg["symbol"] for cfg in markets.values() if cfg["source"] == "binance"]
+    StreamAggregator(symbols).run(feed if feed is not None else binance_kline_feed(symbols))
@@ -0,0 +1,117 @@
+# daemon.py
+import contextlib
+import heapq
+import time as time_module
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import metrics
+from models import DailyResult
+from config import (
+    MARKETS, CLOSE_BUFFER_MINUTES, DAEMON_MAX_SLEEP_SECONDS, DAEMON_CRYPTO_DELAY_MINUTES, HISTORY_ENABLED,
+)
+from processor import collect_data, post_process
+from reporter import render_report, ReportSink
+from utils import next_session_close, get_latest_completed_session
+
+Group = Tuple[Optional[str], str]
+
+
+def _group_markets(markets: Dict[str, Dict]) -> Dict[Group, Dict[str, Dict]]:
+    # 同一日历、同一数据源的标的同时收盘、共用缓冲时间，作为一组调度
+    groups: Dict[Group, Dict[str, Dict]] = {}
+    for name, cfg in markets.items():
+        groups.setdefault((cfg.get("calendar"), cfg["source"]), {})[name] = cfg
+    return groups
+
+
+def _next_fire(group: Group, now: pd.Timestamp) -> pd.Timestamp:
+    calendar_name, source = group
+    buffer = pd.Timedelta(minutes=CLOSE_BUFFER_MINUTES.get(source, 30))
+    if calendar_name:
+        close = next_session_close(calendar_name, now - buffer)
+        if close is not None:
+            return close + buffer
+    # 无日历（加密货币）按 UTC 日线收盘调度；快照范围外时一天后再检查
+    if not calendar_name:
+        buffer = max(buffer, pd.Timedelta(minutes=DAEMON_CRYPTO_DELAY_MINUTES))
+    fire_at = now.normalize() + buffer
+    return fire_at if fire_at > now else fire_at + pd.Timedelta(days=1)
+
+
+def warm_up(markets: Dict[str, Dict]):
+    """预先导入数据源库、建立客户端和日历快照，之后每次触发都不再付启动成本。"""
+    sources = {cfg["source"] for cfg in markets.values()}
+    if "yf" in sources:
+        import yfinance  # noqa: F401
+    if sources & {"ak", "ak_hk"}:
+        import akshare  # noqa: F401
+    if "binance" in sources:
+        from binance_client import get_binance_client
+        get_binance_client()
+    for cfg in markets.values():
+        get_latest_completed_session(cfg.get("calendar"), cfg["source"])
+
+
+class ReportDaemon:
+    """常驻调度：每组标的在其收盘 + CLOSE_BUFFER_MINUTES 后立即获取，并输出更新后的完整日报。"""
+
+    def __init__(self, markets: Optional[Dict[str, Dict]] = None,
+                 sinks_factory: Optional[Callable[[contextlib.ExitStack], List[ReportSink]]] = None,
+                 flush_metrics: Optional[Callable[[], None]] = None):
+        self.markets = MARKETS if markets is None else markets
+        self.sinks_factory = sinks_factory or (lambda stack: None)
+        self.flush_metrics = flush_metrics or metrics.flush
+        self.groups = _group_markets(self.markets)
+        self.latest: Dict[str, DailyResult] = {}
+        self.rolling: Dict[str, Dict] = {}
+        self.crypto_date = None
+        self.us_date = None
+
+    def run_group(self, group: Group):
+        print(f"\n→ 调度触发：{group[0] or 'UTC'} / {group[1]}")
+        results, crypto_date, us_date = collect_data(self.groups[group])
+        for r in results:
+            # 获取失败时保留上一次的有效结果，避免覆盖成 stale
+            if r.status != "stale" or r.name not in self.latest:
+                self.latest[r.name] = r
+        if HISTORY_ENABLED:
+            from result_history import get_result_history, history_keys
+            self.rolling.update(get_result_history().update(results, history_keys(self.markets)))
+        self.crypto_date = crypto_date or self.crypto_date
+        self.us_date = us_date or self.us_date
+        self.emit()
+        # 每次更新后输出并清空本次的指标，常驻进程的事件列表不会无限增长
+        self.flush_metrics()
+
+    def emit(self):
+        ordered = post_process(list(self.latest.values()))
+        with contextlib.ExitStack() as stack:
+            render_report(ordered, self.crypto_date, self.us_date,
+                          sinks=self.sinks_factory(stack), markets=self.markets, rolling=self.rolling)
+
+    def run_forever(self):
+        warm_up(self.markets)
+
+        # 启动时先完整跑一次，之后按各组收盘时间触发
+        for group in self.groups:
+            self.run_group(group)
+
+        now = pd.Timestamp.now(tz="UTC")
+        queue = [(_next_fire(group, now), i, group) for i, group in enumerate(self.groups)]
+        heapq.heapify(queue)
+        while queue:
+            fire_at, i, group = queue[0]
+            wait = (fire_at - pd.Timestamp.now(tz="UTC")).total_seconds()
+            if wait > 0:
+                # 分段睡眠，系统休眠或时钟调整后能及时重新计算
+                time_module.sleep(min(wait, DAEMON_MAX_SLEEP_SECONDS))
+                continue
+            heapq.heappop(queue)
+            try:
+                self.run_group(group)
+            except Exception as e:
+                print(f"  → 调度 {group} 执行异常: {type(e).__name__}: {e}")
+            now = pd.Timestamp.now(tz="UTC")
+            heapq.heappush(queue, (_next_fire(group, now), i, group))
@@ -1,65 +1,271 @@
 # data_fetchers.py
-import yfinance as yf
+import numpy as np
 import pandas as pd
-import ccxt
-import akshare as ak
 from datetime import datetime, date, time
 import pytz
-from typing import Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
-from utils import retry_fetch
+from config import (
+    CRYPTO_EXTREME_SEARCH, CALENDAR_TIMEZONES, MINUTE_SESSION_HOURS,
+    MINUTE_GAP_MAX_ROUNDS, MINUTE_RANGE_MAX_RETRIES, MINUTE_MAX_MISSING_RATIO,
+)
+from utils import retry_fetch, get_circuit_breaker, get_session_close, session_mask, session_breaks_ms
+from binance_client import get_binance_client
+from replay import recordable
 
-def fetch_yf_history(symbol: str) -> Optional[pd.DataFrame]:
+# yfinance / akshare / ccxt 导入耗时较长，均在实际请求时才导入
+
+MINUTE_MS = 60000
+DAY_MS = 86400000
+
+
+def _missing_ranges(have_ms: Iterable[int], start_ms: int, end_ms: int,
+                    excluded: Iterable[Tuple[int, int]] = ()) -> List[Tuple[int, int]]:
+    """返回 [start_ms, end_ms) 内缺失的分钟区间列表，每段为 [起, 止)；excluded 中的区间（如午休）不算缺失。"""
+    expected = np.arange(start_ms, end_ms, MINUTE_MS, dtype=np.int64)
+    for ex_start, ex_end in excluded:
+        expected = expected[(expected < ex_start) | (expected >= ex_end)]
+    missing = np.setdiff1d(expected, np.fromiter(have_ms, dtype=np.int64), assume_unique=True)
+    if len(missing) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(missing) != MINUTE_MS)
+    starts = np.concatenate(([missing[0]], missing[breaks + 1]))
+    ends = np.concatenate((missing[breaks], [missing[-1]])) + MINUTE_MS
+    return [(int(a), int(b)) for a, b in zip(starts, ends)]
+
+
+def _fill_minute_gaps(fetch_range: Callable[[int, int], Optional[pd.DataFrame]], start_ms: int, end_ms: int,
+                      name: str, excluded: List[Tuple[int, int]] = ()) -> Tuple[Optional[pd.DataFrame], int]:
+    """先拉整段，之后只补拉缺失的分钟区间，直到补齐或不再有新数据。
+
+    fetch_range(起 ms, 止 ms) 返回带 ts 列（UTC 毫秒）的分钟线；excluded 为不应有数据的区间（如午休）。
+    返回 (合并后的分钟线, 剩余缺失分钟数)。
+    """
+    frames = []
+    have: set = set()
+    gaps = [(start_ms, end_ms)]
+    for round_no in range(MINUTE_GAP_MAX_ROUNDS):
+        added = 0
+        for gap_start, gap_end in gaps:
+            df = fetch_range(gap_start, gap_end)
+            if df is None or df.empty:
+                continue
+            df = df[(df["ts"] >= gap_start) & (df["ts"] < gap_end) & ~df["ts"].isin(list(have))]
+            if not df.empty:
+                frames.append(df)
+                have.update(df["ts"].tolist())
+                added += len(df)
+        gaps = _missing_ranges(have, start_ms, end_ms, excluded)
+        if not gaps or added == 0:
+            break
+        print(f"  → {name} 分钟线缺失 {len(gaps)} 段（共 {sum((b - a) // MINUTE_MS for a, b in gaps)} 分钟），补拉中")
+
+    if not frames:
+        return None, _expected_minutes(start_ms, end_ms, excluded)
+    merged = pd.concat(frames).sort_values("ts").reset_index(drop=True)
+    return merged, sum((b - a) // MINUTE_MS for a, b in gaps)
+
+
+def _expected_minutes(start_ms: int, end_ms: int, excluded: Iterable[Tuple[int, int]] = ()) -> int:
+    overlap = sum(max(0, min(b, end_ms) - max(a, start_ms)) for a, b in excluded)
+    return (end_ms - start_ms - overlap) // MINUTE_MS
+
+
+def _minutes_complete(missing: int, expected: int) -> bool:
+    return missing <= expected * MINUTE_MAX_MISSING_RATIO
+
+
+def _yf_range_kwargs(start: Optional[date]) -> Dict:
+    # 有本地缓存时只拉取 start 之后的 K 线，否则取最近 60 日
+    return {"start": start.isoformat()} if start else {"period": "60d"}
+
+@recordable()
+def fetch_yf_history(symbol: str, start: Optional[date] = None) -> Optional[pd.DataFrame]:
     def _inner():
+        import yfinance as yf
         ticker = yf.Ticker(symbol)
-        df = ticker.history(period="60d", interval="1d", actions=True, auto_adjust=False)
-        if len(df) < 2:
+        df = ticker.history(interval="1d", actions=True, auto_adjust=False, **_yf_range_kwargs(start))
+        # 增量拉取时一根新 K 线也是有效结果
+        if len(df) < (1 if start else 2):
             return None
 
-        # === 调试日志（保留） ===
-        print(f"→ yf {symbol} 数据最后三行:")
-        print(df.tail(3))
-        print("列名:", list(df.columns))
-        # ===========================
-
         required = ["Open", "High", "Low", "Close"]
         if "Dividends" not in df.columns:
             df["Dividends"] = 0.0
         return df[required + ["Dividends"]]
 
-    return retry_fetch(_inner, success_msg=f"yf {symbol} 日线数据获取成功")
+    return retry_fetch(_inner, success_msg=f"yf {symbol} 日线数据获取成功", min_rows=1 if start else 2,
+                       source="yf")
 
-def fetch_stock_1m_high_low_time(symbol: str, target_date: date) -> Tuple[str, str]:
-    def _inner():
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period="7d", interval="1m", prepost=False)
-        if df.empty:
-            return None
-        # 关键修复5：移除多余的tz_convert，yfinance已正确处理时区
-        df = df[(df.index.time >= time(9, 30)) & (df.index.time <= time(16, 0))]
-        df = df.reset_index().rename(columns={"Datetime": "time"})
-        day_df = df[pd.to_datetime(df["time"]).dt.date == target_date]
-        if day_df.empty:
+def _split_yf_batch(df: pd.DataFrame, symbol: str) -> Optional[pd.DataFrame]:
+    # yf.download 多标的返回 (ticker, field) 两级列；单标的时可能是单级列
+    if isinstance(df.columns, pd.MultiIndex):
+        if symbol not in df.columns.get_level_values(0):
             return None
-        high_t = day_df.loc[day_df["High"].idxmax(), "time"].strftime("%H:%M")
-        low_t = day_df.loc[day_df["Low"].idxmin(), "time"].strftime("%H:%M")
-        return (high_t, low_t)
-    result = retry_fetch(_inner, success_msg=f"{symbol} 分钟极值时间获取成功")
-    return result if result else ("", "")
+        sub = df[symbol]
+    else:
+        sub = df
+    # 多标的合并后索引取并集，非本标的交易日整行为 NaN，需要剔除
+    sub = sub.dropna(subset=[c for c in ["Open", "High", "Low", "Close"] if c in sub.columns], how="all")
+    return sub if not sub.empty else None
+
+@recordable(failure_value={})
+def fetch_yf_history_batch(symbols: List[str], start: Optional[date] = None) -> Dict[str, pd.DataFrame]:
+    """一次请求批量获取多个 yf 标的的日线（默认 60 日，给定 start 时增量拉取），按标的拆分返回。"""
+    if not symbols:
+        return {}
+
+    def _inner():
+        import yfinance as yf
+        df = yf.download(symbols, interval="1d", actions=True, auto_adjust=False,
+                         group_by="ticker", progress=False, threads=True, **_yf_range_kwargs(start))
+        return df if df is not None and len(df) >= (1 if start else 2) else None
+
+    raw = retry_fetch(_inner, success_msg=f"yf 批量日线数据获取成功（{len(symbols)} 个标的）",
+                      min_rows=1 if start else 2, source="yf")
+    if raw is None:
+        return {}
+
+    result = {}
+    for symbol in symbols:
+        df = _split_yf_batch(raw, symbol)
+        if df is None or len(df) < (1 if start else 2):
+            print(f"  → yf 批量结果中缺少 {symbol}")
+            continue
+
+        required = ["Open", "High", "Low", "Close"]
+        df = df.copy()
+        df["Dividends"] = df["Dividends"].fillna(0.0) if "Dividends" in df.columns else 0.0
+        result[symbol] = df[required + ["Dividends"]]
+    return result
+
+@recordable(failure_value={})
+def fetch_stock_1m_batch(symbols: List[str], tz: str = "America/New_York") -> Dict[str, pd.DataFrame]:
+    """一次请求批量获取多个 yf 标的最近 7 日的 1 分钟线，索引统一转换到交易所时区。"""
+    if not symbols:
+        return {}
+
+    def _inner():
+        import yfinance as yf
+        df = yf.download(symbols, period="7d", interval="1m", prepost=False,
+                         group_by="ticker", progress=False, threads=True)
+        return df if df is not None and len(df) >= 2 else None
+
+    raw = retry_fetch(_inner, success_msg=f"yf 批量分钟数据获取成功（{len(symbols)} 个标的）", source="yf")
+    if raw is None:
+        return {}
+
+    if raw.index.tz is not None:
+        raw = raw.tz_convert(tz)
 
+    result = {}
+    for symbol in symbols:
+        df = _split_yf_batch(raw, symbol)
+        if df is not None:
+            result[symbol] = df
+    return result
+
+def extract_stock_high_low_time(df: pd.DataFrame, target_date: date, calendar: Optional[str] = "XNYS"
+                                ) -> Optional[Tuple[str, str]]:
+    if df is None or df.empty:
+        return None
+    df = df[session_mask(df.index, calendar)]
+    day_df = df[df.index.date == target_date]
+    if day_df.empty:
+        return None
+    high_t = day_df["High"].idxmax().strftime("%H:%M")
+    low_t = day_df["Low"].idxmin().strftime("%H:%M")
+    return (high_t, low_t)
+
+def _fetch_yf_minute_range(symbol: str, start_ms: int, end_ms: int, tz: str) -> Optional[pd.DataFrame]:
+    def _inner():
+        import yfinance as yf
+        df = yf.Ticker(symbol).history(start=pd.Timestamp(start_ms, unit="ms", tz="UTC"),
+                                       end=pd.Timestamp(end_ms, unit="ms", tz="UTC"),
+                                       interval="1m", prepost=False)
+        if df is None or df.empty:
+            # 上游没有该区间的分钟线（如停牌、缺失的分钟）不是请求失败：返回空表，不重试、不计入熔断
+            return pd.DataFrame(columns=["ts"])
+        df = df.tz_convert(tz) if df.index.tz is not None else df.tz_localize(tz)
+        df["ts"] = df.index.tz_convert("UTC").as_unit("ms").asi8
+        return df
+
+    return retry_fetch(_inner, success_msg=f"{symbol} 分钟线获取成功", min_rows=0, source="yf",
+                       max_retries=MINUTE_RANGE_MAX_RETRIES)
+
+def _session_window_ms(calendar: Optional[str], day: date) -> Tuple[int, int]:
+    """交易日常规时段的 UTC 毫秒区间 [开盘, 收盘)。"""
+    tz = CALENDAR_TIMEZONES.get(calendar, "America/New_York")
+    session_start, session_end = MINUTE_SESSION_HOURS.get(calendar, ("09:30", "16:00"))
+    open_ts = pd.Timestamp(f"{day} {session_start}", tz=tz)
+    close_ts = pd.Timestamp(f"{day} {session_end}", tz=tz)
+    actual_close = get_session_close(calendar, day)
+    if actual_close is not None:
+        close_ts = min(close_ts, actual_close)  # 提前收盘日只检查到实际收盘
+    return int(open_ts.tz_convert("UTC").value // 1_000_000), int(close_ts.tz_convert("UTC").value // 1_000_000)
+
+def minute_day_complete(ts_ms: Iterable[int], calendar: Optional[str], day: date) -> bool:
+    """某交易日的分钟线（UTC 毫秒时间戳）缺失比例是否不超过 MINUTE_MAX_MISSING_RATIO，午休不计入。"""
+    start_ms, end_ms = _session_window_ms(calendar, day)
+    breaks = session_breaks_ms(calendar, day)
+    have = np.unique(np.fromiter(ts_ms, dtype=np.int64))
+    missing = sum((b - a) // MINUTE_MS for a, b in _missing_ranges(have, start_ms, end_ms, breaks))
+    return _minutes_complete(missing, _expected_minutes(start_ms, end_ms, breaks))
+
+def minute_frame_complete(df: pd.DataFrame, calendar: Optional[str], day: date) -> bool:
+    """交易所本地时间索引的分钟线中，某交易日是否完整（见 minute_day_complete）。"""
+    df = df[session_mask(df.index, calendar) & (df.index.date == day)]
+    return minute_day_complete(df.index.tz_convert("UTC").as_unit("ms").asi8, calendar, day)
+
+@recordable(failure_value=("", "", False))
+def fetch_stock_1m_high_low_time(symbol: str, target_date: date, calendar: str = "XNYS") -> Tuple[str, str, bool]:
+    """只拉取目标交易日的分钟线并按缺口补拉，返回 (最高时间, 最低时间, 分钟线是否完整)。"""
+    tz = CALENDAR_TIMEZONES.get(calendar, "America/New_York")
+    start_ms, end_ms = _session_window_ms(calendar, target_date)
+    breaks = session_breaks_ms(calendar, target_date)
+    df, missing = _fill_minute_gaps(lambda a, b: _fetch_yf_minute_range(symbol, a, b, tz), start_ms, end_ms, symbol,
+                                    excluded=breaks)
+    result = None
+    if df is not None:
+        df.index = pd.DatetimeIndex(pd.to_datetime(df["ts"].to_numpy(), unit="ms", utc=True)).tz_convert(tz)
+        result = extract_stock_high_low_time(df, target_date, calendar)
+    if result is None:
+        print(f"→ {symbol} 分钟极值时间获取失败")
+        return ("", "", False)
+    print(f"→ {symbol} 分钟极值时间获取成功" + (f"（缺失 {missing} 分钟）" if missing else ""))
+    return (*result, _minutes_complete(missing, _expected_minutes(start_ms, end_ms, breaks)))
+
+def normalize_daily_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """统一不同数据源的日线：按交易所本地日期的无时区索引，列为 Open/High/Low/Close/Dividends。"""
+    df = df.copy()
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index.normalize()
+    if "Dividends" not in df.columns:
+        df["Dividends"] = 0.0
+    df = df[["Open", "High", "Low", "Close", "Dividends"]].astype(float)
+    df["Dividends"] = df["Dividends"].fillna(0.0)
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+def fetch_daily_from(spec: Dict, start: Optional[date] = None) -> Optional[pd.DataFrame]:
+    """按数据源配置（source + symbol/ak_symbol）获取日线，主源与备用源共用。"""
+    if spec["source"] == "yf":
+        df = fetch_yf_history(spec["symbol"], start=start)
+    else:
+        # akshare 接口不支持按日期查询，只能整段拉取
+        df = fetch_ak_index(spec["ak_symbol"], "ak_hk" if spec["source"] == "ak_hk" else "ak")
+    return normalize_daily_frame(df) if df is not None else None
+
+@recordable()
 def fetch_ak_index(ak_symbol: str, source_type: str) -> Optional[pd.DataFrame]:
     def _inner():
+        import akshare as ak
         if source_type == "ak_hk":
             df_raw = ak.stock_hk_index_daily_em(symbol=ak_symbol)
         else:
             df_raw = ak.index_global_hist_em(symbol=ak_symbol)
 
-        # === 调试日志（保留） ===
-        print(f"→ ak {ak_symbol} ({'港股指数' if source_type == 'ak_hk' else '全球指数'}) 数据最后三行:")
-        print(df_raw.tail(3) if not df_raw.empty else "（空数据）")
-        print("列名:", list(df_raw.columns) if not df_raw.empty else "empty")
-        # ===========================
-
         if df_raw is None or df_raw.empty or len(df_raw) < 2:
             return None
 
@@ -87,40 +293,127 @@ def fetch_ak_index(ak_symbol: str, source_type: str) -> Optional[pd.DataFrame]:
         return df_raw[required + ["Dividends"]]
 
     msg = f"ak {ak_symbol} ({'港股指数' if source_type == 'ak_hk' else '全球指数'}) 数据获取成功"
-    return retry_fetch(_inner, success_msg=msg)
+    return retry_fetch(_inner, success_msg=msg, source=source_type)
 
-def fetch_crypto_daily(symbol: str, name: str) -> Tuple[date, float, float, float, float]:
+@recordable()
+def fetch_crypto_daily(symbol: str, name: str) -> Optional[Tuple[date, float, float, float, float]]:
     def _inner():
-        exchange = ccxt.binance({'enableRateLimit': True})
+        exchange = get_binance_client()
         ohlcv = exchange.fetch_ohlcv(symbol, timeframe='1d', limit=3)
-        if len(ohlcv) < 3:
+        # 取最近一根已收盘的日线，而不是固定取倒数第二根：0 点刚过时新日线可能尚未出现
+        now_ms = int(datetime.now(tz=pytz.UTC).timestamp() * 1000)
+        closed = [k for k in ohlcv if k[0] + DAY_MS <= now_ms]
+        if not closed:
             return None
-        prev = ohlcv[-2]
+        prev = closed[-1]
         dt = datetime.fromtimestamp(prev[0] / 1000, tz=pytz.UTC).date()
         return dt, round(prev[1], 2), round(prev[2], 2), round(prev[3], 2), round(prev[4], 2)
-    result = retry_fetch(_inner, success_msg=f"{name} 日线数据获取成功")
-    if result is None:
-        return date.today(), 0.0, 0.0, 0.0, 0.0
-    return result
+    # 失败时返回 None，由 collect_data 标记为 stale
+    return retry_fetch(_inner, success_msg=f"{name} 日线数据获取成功", source="binance")
 
-def fetch_crypto_high_low_time(symbol: str, target_start_ms: int, name: str) -> Tuple[str, str]:
+@recordable()
+def fetch_crypto_daily_range(symbol: str, name: str, start: date, end: date) -> Optional[pd.DataFrame]:
+    """分页获取 [start, end] 内已收盘的加密货币日线，索引为 UTC 日期。"""
     def _inner():
-        exchange = ccxt.binance({'enableRateLimit': True})
-        all_ohlcv = []
-        since = target_start_ms
-        for _ in range(3):
-            batch = exchange.fetch_ohlcv(symbol, '1m', since=since, limit=720)
+        exchange = get_binance_client()
+        since = int(datetime.combine(start, time.min).replace(tzinfo=pytz.UTC).timestamp() * 1000)
+        end_ms = int(datetime.combine(end, time.min).replace(tzinfo=pytz.UTC).timestamp() * 1000)
+        rows = []
+        while since <= end_ms:
+            batch = exchange.fetch_ohlcv(symbol, '1d', since=since, limit=1000)
             if not batch:
                 break
-            all_ohlcv.extend(batch)
-            since = batch[-1][0] + 60000
-        df = pd.DataFrame(all_ohlcv, columns=["ts", "O", "H", "L", "C", "V"])
-        df = df[df["ts"] < target_start_ms + 86400000]
-        if len(df) < 1380:
+            rows.extend(batch)
+            since = batch[-1][0] + 86400000
+        if not rows:
             return None
-        df["time"] = pd.to_datetime(df["ts"], unit="ms", utc=True).dt.tz_convert("Asia/Shanghai")
-        high_t = df.loc[df["H"].idxmax(), "time"].strftime("%H:%M")
-        low_t = df.loc[df["L"].idxmin(), "time"].strftime("%H:%M")
-        return (high_t, low_t)
-    result = retry_fetch(_inner, success_msg=f"{name} 分钟极值时间获取成功")
-    return result if result else ("", "")
\ No newline at end of file
+        df = pd.DataFrame(rows, columns=["ts", "Open", "High", "Low", "Close", "Volume"])
+        # 当天的 K 线尚未收盘，不参与回填
+        today_ms = int(datetime.combine(datetime.now(tz=pytz.UTC).date(), time.min)
+                       .replace(tzinfo=pytz.UTC).timestamp() * 1000)
+        df = df[(df["ts"] <= end_ms) & (df["ts"] < today_ms)].drop_duplicates("ts")
+        df.index = pd.to_datetime(df["ts"], unit="ms")
+        df.index.name = "date"
+        return df[["Open", "High", "Low", "Close"]]
+
+    return retry_fetch(_inner, success_msg=f"{name} 区间日线数据获取成功", min_rows=1, source="binance")
+
+def _coarse_to_fine_extreme_time(symbol: str, target_start_ms: int) -> Optional[Tuple[str, str]]:
+    """先取当日 1h K 线定位极值所在小时，再只拉这一两个小时的 1m K 线。
+
+    小时 K 线的最高/最低等于其内部分钟 K 线的最高/最低，因此全天最早触及极值的分钟
+    一定落在最早出现该极值的小时内。数据不完整或前后不一致时返回 None，由调用方回退全量扫描。
+    """
+    exchange = get_binance_client()
+    hourly = exchange.fetch_ohlcv(symbol, '1h', since=target_start_ms, limit=24)
+    hourly = [bar for bar in hourly if bar[0] < target_start_ms + 86400000]
+    if len(hourly) != 24:
+        return None
+
+    day_high = max(bar[2] for bar in hourly)
+    day_low = min(bar[3] for bar in hourly)
+    high_hour = next(bar[0] for bar in hourly if bar[2] == day_high)
+    low_hour = next(bar[0] for bar in hourly if bar[3] == day_low)
+
+    minutes = {}
+    for hour_ms in {high_hour, low_hour}:
+        batch = exchange.fetch_ohlcv(symbol, '1m', since=hour_ms, limit=60)
+        batch = [bar for bar in batch if hour_ms <= bar[0] < hour_ms + 3600000]
+        if len(batch) != 60:
+            return None
+        minutes[hour_ms] = batch
+
+    high_bar = next((bar for bar in minutes[high_hour] if bar[2] == day_high), None)
+    low_bar = next((bar for bar in minutes[low_hour] if bar[3] == day_low), None)
+    if high_bar is None or low_bar is None:
+        return None
+
+    tz = pytz.timezone("Asia/Shanghai")
+    high_t = datetime.fromtimestamp(high_bar[0] / 1000, tz=tz).strftime("%H:%M")
+    low_t = datetime.fromtimestamp(low_bar[0] / 1000, tz=tz).strftime("%H:%M")
+    return (high_t, low_t)
+
+def _fetch_crypto_minute_range(symbol: str, start_ms: int, end_ms: int, name: str) -> Optional[pd.DataFrame]:
+    def _inner():
+        exchange = get_binance_client()
+        rows = []
+        since = start_ms
+        while since < end_ms:
+            batch = exchange.fetch_ohlcv(symbol, '1m', since=since,
+                                         limit=min(1000, max(1, (end_ms - since) // MINUTE_MS)))
+            if not batch:
+                break
+            rows.extend(batch)
+            since = batch[-1][0] + MINUTE_MS
+        # 没有数据时返回空表，与 yf 分钟线区间一致：只有异常才重试并计入熔断
+        return pd.DataFrame(rows, columns=["ts", "O", "H", "L", "C", "V"])
+
+    return retry_fetch(_inner, success_msg=f"{name} 分钟线获取成功", min_rows=0, source="binance",
+                       max_retries=MINUTE_RANGE_MAX_RETRIES)
+
+@recordable(failure_value=("", "", False))
+def fetch_crypto_high_low_time(symbol: str, target_start_ms: int, name: str) -> Tuple[str, str, bool]:
+    """返回 (最高时间, 最低时间, 分钟线是否完整)，时间为北京时间 HH:MM。"""
+    if CRYPTO_EXTREME_SEARCH == "coarse" and get_circuit_breaker("binance").allow():
+        try:
+            result = _coarse_to_fine_extreme_time(symbol, target_start_ms)
+        except Exception as e:
+            print(f"  → {name} 分层搜索失败: {type(e).__name__}: {e}")
+            result = None
+        if result is not None:
+            print(f"→ {name} 分钟极值时间获取成功（分层搜索）")
+            return (*result, True)
+        print(f"  → {name} 分层搜索结果不确定，回退全量分钟扫描")
+
+    # 全量扫描：整天拉一次，之后只补拉缺失的分钟区间，而不是整天重新下载
+    end_ms = target_start_ms + DAY_MS
+    df, missing = _fill_minute_gaps(lambda a, b: _fetch_crypto_minute_range(symbol, a, b, name),
+                                    target_start_ms, end_ms, name)
+    if df is None:
+        print(f"→ {name} 分钟极值时间获取失败")
+        return ("", "", False)
+    df["time"] = pd.to_datetime(df["ts"], unit="ms", utc=True).dt.tz_convert("Asia/Shanghai")
+    high_t = df.loc[df["H"].idxmax(), "time"].strftime("%H:%M")
+    low_t = df.loc[df["L"].idxmin(), "time"].strftime("%H:%M")
+    print(f"→ {name} 分钟极值时间获取成功" + (f"（缺失 {missing} 分钟）" if missing else ""))
+    return (high_t, low_t, _minutes_complete(missing, DAY_MS // MINUTE_MS))
\ No newline at end of file
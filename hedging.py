@@ -0,0 +1,155 @@
+# hedging.py
+import contextvars
+import json
+import os
+import threading
+import time as time_module
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from config import (
+    HEDGE_DELAY_QUANTILE, HEDGE_MIN_DELAY_SECONDS, HEDGE_MAX_DELAY_SECONDS, HEDGE_DEFAULT_DELAY_SECONDS,
+    SOURCE_LATENCY_WINDOW, SOURCE_LATENCY_MIN_SAMPLES, SOURCE_LATENCY_PATH,
+)
+from utils import cancellable
+
+Candidate = Tuple[str, Callable[[], Optional[pd.DataFrame]]]
+
+
+class SourceLatency:
+    """各数据源最近 SOURCE_LATENCY_WINDOW 次请求的耗时，跨运行保存在 JSON 文件中。
+
+    失败的请求按 HEDGE_MAX_DELAY_SECONDS 计入，使持续失败的源排到后面；被取消的请求按取消时已耗费的时间计入
+    （实际耗时只会更长），否则总是落败的慢源永远没有样本，会一直排在首位。
+    """
+
+    def __init__(self, path: str = SOURCE_LATENCY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for source, values in json.load(f).items():
+                    self._samples[source] = deque(values, maxlen=SOURCE_LATENCY_WINDOW)
+        except (OSError, ValueError):
+            pass
+
+    def record(self, source: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(source, deque(maxlen=SOURCE_LATENCY_WINDOW)).append(round(seconds, 3))
+            snapshot = {s: list(v) for s, v in self._samples.items()}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"  → 数据源耗时统计写入失败: {e}")
+
+    def quantile(self, source: str, q: float) -> Optional[float]:
+        with self._lock:
+            values = list(self._samples.get(source, ()))
+        if len(values) < SOURCE_LATENCY_MIN_SAMPLES:
+            return None
+        return float(np.quantile(values, q))
+
+    def rank(self, candidates: List[Candidate]) -> List[Candidate]:
+        # 按耗时中位数排序，样本不足的源排在有统计的源之后；首选源尚无统计时保持配置顺序
+        medians = [self.quantile(source, 0.5) for source, _ in candidates]
+        if medians[0] is None:
+            return list(candidates)
+        order = sorted(range(len(candidates)), key=lambda i: (medians[i] is None, medians[i] or 0.0))
+        return [candidates[i] for i in order]
+
+    def hedge_delay(self, source: str) -> float:
+        delay = self.quantile(source, HEDGE_DELAY_QUANTILE)
+        if delay is None:
+            return HEDGE_DEFAULT_DELAY_SECONDS
+        return min(max(delay, HEDGE_MIN_DELAY_SECONDS), HEDGE_MAX_DELAY_SECONDS)
+
+
+_default_latency: Optional[SourceLatency] = None
+_default_lock = threading.Lock()
+
+
+def get_source_latency() -> SourceLatency:
+    global _default_latency
+    with _default_lock:
+        if _default_latency is None:
+            _default_latency = SourceLatency()
+        return _default_latency
+
+
+def hedged_fetch(candidates: List[Candidate], name: str, min_rows: int = 2
+                 ) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """按耗时排序依次请求各数据源：当前源超过延迟阈值或返回无效数据时启动下一个源，
+    先返回有效数据者胜出，其余请求被取消。返回 (数据, 胜出的数据源)。
+    """
+    latency = get_source_latency()
+    ordered = latency.rank(candidates)
+    cancels = [threading.Event() for _ in ordered]
+    starts: Dict[int, float] = {}
+    recorded = set()
+    record_lock = threading.Lock()
+
+    def _record(i: int, seconds: float):
+        # 请求结束与被取消可能同时发生，每个请求只计一次
+        with record_lock:
+            if i in recorded:
+                return
+            recorded.add(i)
+        latency.record(ordered[i][0], seconds)
+
+    def _run(i: int) -> Optional[pd.DataFrame]:
+        with cancellable(cancels[i]):
+            df = ordered[i][1]()
+        if not cancels[i].is_set():
+            ok = df is not None and len(df) >= min_rows
+            _record(i, time_module.monotonic() - starts[i] if ok else HEDGE_MAX_DELAY_SECONDS)
+        return df
+
+    def _submit(i: int) -> Future:
+        starts[i] = time_module.monotonic()
+        # 带上调用方的上下文（当前 metrics 阶段等）；并发上限由 retry_fetch 按数据源控制
+        return pool.submit(contextvars.copy_context().run, _run, i)
+
+    pool = ThreadPoolExecutor(max_workers=len(ordered), thread_name_prefix="hedge")
+    pending: Dict[Future, int] = {_submit(0): 0}
+    next_i = 1
+    try:
+        while pending:
+            # 还有备用源时只等待到延迟阈值；否则等任一请求结束
+            timeout = latency.hedge_delay(ordered[next_i - 1][0]) if next_i < len(ordered) else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    df = future.result()
+                except Exception as e:
+                    print(f"  → {name} 数据源 {ordered[i][0]} 异常: {type(e).__name__}: {e}")
+                    df = None
+                if df is not None and len(df) >= min_rows:
+                    if i > 0:
+                        print(f"  → {name} 使用备用数据源 {ordered[i][0]} 的结果")
+                    return df, ordered[i][0]
+            if next_i < len(ordered):
+                # 超过阈值未返回时对冲；已返回但数据无效时直接换下一个源
+                print(f"  → {name} {'启动对冲请求' if not done else '切换数据源'}：{ordered[next_i][0]}")
+                metrics.add("hedged_requests" if not done else "source_failovers", 1)
+                pending[_submit(next_i)] = next_i
+                next_i += 1
+        return None, None
+    finally:
+        for event in cancels:
+            event.set()
+        now = time_module.monotonic()
+        for future, i in pending.items():
+            if not future.done():
+                _record(i, now - starts[i])
+        pool.shutdown(wait=False, cancel_futures=True)
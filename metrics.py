@@ -0,0 +1,156 @@
+# metrics.py
+import cProfile
+import contextvars
+import json
+import os
+import threading
+import time as time_module
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+_events: List[Dict] = []
+_events_lock = threading.Lock()
+# 已 flush 的事件按 (阶段, 数据源) 累计，Prometheus 计数器跨多次 flush 单调递增
+_totals: Dict[tuple, Dict[str, float]] = {}
+_latest: Dict[tuple, float] = {}
+# 用 contextvars 而不是 threading.local：对冲等子线程通过 copy_context().run 继承当前阶段
+_stack_var: contextvars.ContextVar[Tuple[Dict, ...]] = contextvars.ContextVar("metrics_stack", default=())
+
+
+def _stack() -> Tuple[Dict, ...]:
+    return _stack_var.get()
+
+
+@contextmanager
+def stage(name: str, symbol: Optional[str] = None, source: Optional[str] = None):
+    """记录一个阶段的耗时；阶段内调用 annotate/add 的字段会附加到这条记录上。"""
+    event = {"stage": name, "symbol": symbol, "source": source,
+             "retries": 0, "rows": 0, "bytes": 0, "ok": True}
+    token = _stack_var.set(_stack() + (event,))
+    start = time_module.perf_counter()
+    try:
+        yield event
+    except Exception:
+        event["ok"] = False
+        raise
+    finally:
+        event["seconds"] = time_module.perf_counter() - start
+        event["ts"] = time_module.time()
+        _stack_var.reset(token)
+        with _events_lock:
+            _events.append(event)
+
+
+def annotate(**fields):
+    """覆盖当前阶段的字段；不在任何阶段内时忽略。"""
+    stack = _stack()
+    if stack:
+        stack[-1].update(fields)
+
+
+def add(field: str, value: float):
+    """在当前阶段的字段上累加（如 retries、bytes）。"""
+    stack = _stack()
+    if stack:
+        stack[-1][field] = stack[-1].get(field, 0) + value
+
+
+def events() -> List[Dict]:
+    with _events_lock:
+        return list(_events)
+
+
+def reset():
+    with _events_lock:
+        _events.clear()
+        _totals.clear()
+        _latest.clear()
+
+
+def _fold(pending: List[Dict]):
+    for event in pending:
+        key = (event["stage"], event["source"] or "")
+        agg = _totals.setdefault(key, {"seconds": 0.0, "count": 0, "retries": 0, "rows": 0, "bytes": 0, "errors": 0})
+        agg["seconds"] += event["seconds"]
+        agg["count"] += 1
+        agg["retries"] += event.get("retries", 0)
+        agg["rows"] += event.get("rows", 0)
+        agg["bytes"] += event.get("bytes", 0)
+        agg["errors"] += 0 if event.get("ok", True) else 1
+        if event["symbol"]:
+            _latest[(event["stage"], event["source"] or "", event["symbol"])] = event["seconds"]
+
+
+def flush(jsonl_path: Optional[str] = None, prom_path: Optional[str] = None):
+    """把未输出的事件追加到 JSON lines、并入累计值后重写 Prometheus 文件，然后清空事件。
+
+    常驻模式每次更新后调用一次，事件列表不会无限增长。
+    """
+    with _events_lock:
+        pending = list(_events)
+        _events.clear()
+        _fold(pending)
+    if jsonl_path:
+        write_jsonl(jsonl_path, pending)
+    if prom_path:
+        write_prometheus(prom_path)
+
+
+def write_jsonl(path: str, pending: Optional[List[Dict]] = None):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for event in events() if pending is None else pending:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus(path: str):
+    """输出 node_exporter textfile 格式：阶段汇总（累计值）+ 每个标的最近一次耗时。"""
+    with _events_lock:
+        totals = {key: dict(agg) for key, agg in _totals.items()}
+        latest = dict(_latest)
+
+    lines = [
+        "# HELP dailyreport_stage_seconds 各阶段耗时（秒）",
+        "# TYPE dailyreport_stage_seconds summary",
+    ]
+    for (stage_name, source), agg in sorted(totals.items()):
+        labels = f'stage="{_label(stage_name)}",source="{_label(source)}"'
+        lines.append(f"dailyreport_stage_seconds_sum{{{labels}}} {agg['seconds']}")
+        lines.append(f"dailyreport_stage_seconds_count{{{labels}}} {agg['count']}")
+
+    for metric, field, help_text in (
+        ("dailyreport_fetch_retries_total", "retries", "获取重试次数"),
+        ("dailyreport_fetch_rows_total", "rows", "获取到的数据行数"),
+        ("dailyreport_fetch_bytes_total", "bytes", "获取到的数据字节数"),
+        ("dailyreport_stage_errors_total", "errors", "阶段异常次数"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (stage_name, source), agg in sorted(totals.items()):
+            lines.append(f'{metric}{{stage="{_label(stage_name)}",source="{_label(source)}"}} {agg[field]}')
+
+    lines.append("# HELP dailyreport_symbol_stage_seconds 每个标的各阶段最近一次耗时（秒）")
+    lines.append("# TYPE dailyreport_symbol_stage_seconds gauge")
+    for (stage_name, source, symbol), seconds in sorted(latest.items()):
+        lines.append(f'dailyreport_symbol_stage_seconds{{stage="{_label(stage_name)}",'
+                     f'source="{_label(source)}",symbol="{_label(symbol)}"}} {seconds}')
+
+    # 先写临时文件再替换，避免采集端读到写了一半的文件
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def profile_run(func: Callable, path: str, *args, **kwargs):
+    """在 cProfile 下执行 func，并把统计结果写入 path（可用 pstats / snakeviz 查看）。"""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(path)
@@ -0,0 +1,134 @@
+# minute_store.py
+import json
+import os
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import MINUTE_STORE_DIR
+from utils import session_mask
+
+_FIELDS = {"ts": np.int64, "high": np.float64, "low": np.float64, "close": np.float64}
+
+
+class MinuteStore:
+    """按标的存放 1m K 线的追加式列存储。
+
+    每个标的一个目录，每列一个定长二进制文件（ts 为 UTC 毫秒），index.json 记录
+    交易日 → [起始行, 结束行)。读取时用 np.memmap 取切片，不复制数据。
+    """
+
+    def __init__(self, root: str = MINUTE_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, Dict[str, List[int]]] = {}
+
+    def _dir(self, symbol: str) -> str:
+        safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in symbol)
+        return os.path.join(self.root, safe)
+
+    def _index(self, symbol: str) -> Dict[str, List[int]]:
+        if symbol not in self._indexes:
+            try:
+                with open(os.path.join(self._dir(symbol), "index.json"), "r", encoding="utf-8") as f:
+                    self._indexes[symbol] = json.load(f)
+            except (OSError, ValueError):
+                self._indexes[symbol] = {}
+        return self._indexes[symbol]
+
+    def has_day(self, symbol: str, day: date) -> bool:
+        with self._lock:
+            return day.isoformat() in self._index(symbol)
+
+    def _append_day(self, symbol: str, day: date, columns: Dict[str, np.ndarray]):
+        directory = self._dir(symbol)
+        os.makedirs(directory, exist_ok=True)
+        paths = {field: os.path.join(directory, f"{field}.bin") for field in _FIELDS}
+
+        # 上次追加中途中断时各列行数可能不一致，先截断到最短的一列
+        rows = min(
+            (os.path.getsize(p) // np.dtype(dtype).itemsize if os.path.exists(p) else 0)
+            for p, dtype in zip(paths.values(), _FIELDS.values())
+        )
+        for field, dtype in _FIELDS.items():
+            if os.path.exists(paths[field]):
+                os.truncate(paths[field], rows * np.dtype(dtype).itemsize)
+            with open(paths[field], "ab") as f:
+                np.ascontiguousarray(columns[field], dtype=dtype).tofile(f)
+
+        index = self._index(symbol)
+        index[day.isoformat()] = [rows, rows + len(columns["ts"])]
+        index_path = os.path.join(directory, "index.json")
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+
+    def append_frame(self, symbol: str, df: pd.DataFrame, calendar: Optional[str],
+                     through: Optional[date] = None,
+                     is_complete: Optional[Callable[[date, np.ndarray], bool]] = None) -> int:
+        """把分钟线按交易日拆分写入；只写入 through 及之前、尚未存储的交易日。返回新写入的天数。
+
+        给定 is_complete(交易日, UTC 毫秒时间戳) 时跳过不完整的交易日：已存储的交易日不会再下载，
+        写入缺分钟的一天会让错误的极值时间一直以 ok 状态输出。
+        """
+        if df is None or df.empty:
+            return 0
+        df = df[session_mask(df.index, calendar)]
+        utc_index = df.index.tz_convert("UTC") if df.index.tz is not None else df.index
+        ts = utc_index.as_unit("ms").asi8
+        local_dates = df.index.date
+        written = 0
+        with self._lock:
+            index = self._index(symbol)
+            for day in sorted(set(local_dates)):
+                if (through is not None and day > through) or day.isoformat() in index:
+                    continue
+                mask = local_dates == day
+                if is_complete is not None and not is_complete(day, ts[mask]):
+                    print(f"  → {symbol} {day} 分钟线不完整，暂不存储")
+                    continue
+                self._append_day(symbol, day, {
+                    "ts": ts[mask],
+                    "high": df["High"].to_numpy(dtype=np.float64)[mask],
+                    "low": df["Low"].to_numpy(dtype=np.float64)[mask],
+                    "close": df["Close"].to_numpy(dtype=np.float64)[mask],
+                })
+                written += 1
+        return written
+
+    def day_slice(self, symbol: str, day: date) -> Optional[Dict[str, np.ndarray]]:
+        with self._lock:
+            span = self._index(symbol).get(day.isoformat())
+        if span is None or span[0] == span[1]:
+            return None
+        directory = self._dir(symbol)
+        return {
+            field: np.memmap(os.path.join(directory, f"{field}.bin"), dtype=dtype, mode="r")[span[0]:span[1]]
+            for field, dtype in _FIELDS.items()
+        }
+
+    def extreme_times(self, symbol: str, day: date, tz: str) -> Optional[Tuple[str, str]]:
+        """当日最高/最低首次出现的本地时间（HH:MM）。"""
+        bars = self.day_slice(symbol, day)
+        if bars is None:
+            return None
+        high_ts = int(bars["ts"][int(np.argmax(bars["high"]))])
+        low_ts = int(bars["ts"][int(np.argmin(bars["low"]))])
+        to_local = lambda ms: pd.Timestamp(ms, unit="ms", tz="UTC").tz_convert(tz).strftime("%H:%M")
+        return to_local(high_ts), to_local(low_ts)
+
+
+_default_store: Optional[MinuteStore] = None
+_default_lock = threading.Lock()
+
+
+def get_minute_store() -> MinuteStore:
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = MinuteStore()
+        return _default_store
@@ -1,7 +1,10 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, fields, astuple
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 
-@dataclass
+import numpy as np
+import pandas as pd
+
+@dataclass(slots=True)
 class DailyResult:
     name: str
     high: Optional[float]
@@ -15,4 +18,56 @@ class DailyResult:
     amplitude_pct: Optional[float]
     result_type: str
     date_str: str
-    status: str = "ok"
\ No newline at end of file
+    status: str = "ok"
+
+
+RESULT_FIELDS = [f.name for f in fields(DailyResult)]
+FLOAT_FIELDS = ["high", "high_pct", "low", "low_pct", "close", "close_pct", "amplitude_pct"]
+_FLOAT_POSITIONS = {RESULT_FIELDS.index(f) for f in FLOAT_FIELDS}
+
+
+class ResultTable:
+    """按列存储的日报结果，数值列为 float64（缺失为 NaN）；迭代时以 DailyResult 作为行视图返回。"""
+
+    def __init__(self, frame: Optional[pd.DataFrame] = None):
+        if frame is None:
+            frame = pd.DataFrame(columns=RESULT_FIELDS)
+        frame = frame.reindex(columns=RESULT_FIELDS).reset_index(drop=True)
+        frame[FLOAT_FIELDS] = frame[FLOAT_FIELDS].astype("float64")
+        self.frame = frame
+
+    @classmethod
+    def from_results(cls, results: Iterable[DailyResult]) -> "ResultTable":
+        if isinstance(results, ResultTable):
+            return results
+        return cls(pd.DataFrame([astuple(r) for r in results], columns=RESULT_FIELDS))
+
+    @staticmethod
+    def _row(values: tuple) -> DailyResult:
+        return DailyResult(*[
+            (None if np.isnan(v) else float(v)) if i in _FLOAT_POSITIONS else v
+            for i, v in enumerate(values)
+        ])
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __iter__(self) -> Iterator[DailyResult]:
+        for values in self.frame.itertuples(index=False, name=None):
+            yield self._row(values)
+
+    def __getitem__(self, i: int) -> DailyResult:
+        return self._row(tuple(self.frame.iloc[i]))
+
+    def to_results(self) -> List[DailyResult]:
+        return list(self)
+
+    def reorder(self, order: List[str]) -> "ResultTable":
+        """按 order 中的名称顺序稳定排序，不在 order 中的排在最后并保持原有相对顺序。"""
+        order_map = {name: i for i, name in enumerate(order)}
+        keys = self.frame["name"].map(order_map).fillna(len(order_map)).to_numpy()
+        return ResultTable(self.frame.iloc[np.argsort(keys, kind="stable")])
+
+    def group_index(self, by: List[Union[str, pd.Series]]) -> Dict:
+        """返回 分组键 → 行位置数组 的索引，分组顺序按首次出现；by 可混用列名和与行对齐的 Series，键为空的行不计入。"""
+        return self.frame.groupby(by, sort=False).indices
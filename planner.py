@@ -0,0 +1,111 @@
+# planner.py
+import contextlib
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+from models import ResultTable
+from config import MARKETS, DISPLAY_ORDER, REPORT_PROFILES, HISTORY_ENABLED
+from processor import collect_data, post_process
+from reporter import render_report, ReportSink, TextSink
+
+FetchKey = Tuple[str, str, Optional[str], str]
+
+
+@dataclass
+class ReportProfile:
+    name: str
+    markets: Dict[str, Dict]
+    display_order: List[str] = field(default_factory=list)
+    outputs: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class FetchPlan:
+    """去重后的获取计划：markets 直接交给 collect_data，aliases 记录各档案内名称对应的计划名称。"""
+    markets: Dict[str, Dict]
+    aliases: Dict[str, Dict[str, str]]
+
+
+def load_profiles(names: Optional[List[str]] = None) -> List[ReportProfile]:
+    """从 config.REPORT_PROFILES 读取档案；未配置任何档案时退回默认的 MARKETS/DISPLAY_ORDER。"""
+    if not REPORT_PROFILES:
+        return [ReportProfile("default", MARKETS, DISPLAY_ORDER)]
+    profiles = []
+    for name in names or list(REPORT_PROFILES):
+        spec = REPORT_PROFILES[name]
+        markets = spec.get("markets", MARKETS)
+        if not isinstance(markets, dict):
+            markets = {m: MARKETS[m] for m in markets}
+        profiles.append(ReportProfile(name, markets, spec.get("display_order", list(markets)),
+                                      list(spec.get("outputs", []))))
+    return profiles
+
+
+def _fetch_key(cfg: Dict) -> FetchKey:
+    # 同一数据源、代码、日历和结果类型的标的获取与计算完全相同，只是展示名称不同
+    return cfg["source"], cfg.get("symbol") or cfg["ak_symbol"], cfg.get("calendar"), cfg["type"]
+
+
+def build_fetch_plan(profiles: List[ReportProfile]) -> FetchPlan:
+    plan_names: Dict[FetchKey, str] = {}
+    markets: Dict[str, Dict] = {}
+    aliases: Dict[str, Dict[str, str]] = {}
+    for profile in profiles:
+        alias = aliases.setdefault(profile.name, {})
+        for name, cfg in profile.markets.items():
+            key = _fetch_key(cfg)
+            if key not in plan_names:
+                # 不同档案可能用同一名称指向不同标的，计划名称需唯一
+                plan_name, n = name, 1
+                while plan_name in markets:
+                    n += 1
+                    plan_name = f"{name}#{n}"
+                plan_names[key] = plan_name
+                markets[plan_name] = cfg
+            alias[name] = plan_names[key]
+    return FetchPlan(markets, aliases)
+
+
+def fan_out(table: ResultTable, plan: FetchPlan, profile: ReportProfile) -> ResultTable:
+    """从共享结果中取出某个档案的行，并换回档案内的名称。"""
+    positions = {name: i for i, name in enumerate(table.frame["name"])}
+    alias = plan.aliases[profile.name]
+    frame = table.frame.iloc[[positions[plan_name] for plan_name in alias.values()]].copy()
+    frame["name"] = list(alias)
+    return ResultTable(frame)
+
+
+def run_profiles(profiles: List[ReportProfile],
+                 sinks_factory: Optional[Callable[[ReportProfile, contextlib.ExitStack], List[ReportSink]]] = None):
+    """按去重后的计划获取一次数据，再分发给各档案分别排序、渲染；上游请求数只随不同标的数增长。"""
+    plan = build_fetch_plan(profiles)
+    total = sum(len(p.markets) for p in profiles)
+    print(f"→ {len(profiles)} 份日报共 {total} 个标的，去重后需获取 {len(plan.markets)} 个")
+
+    with metrics.stage("collect"):
+        results, crypto_date, us_date = collect_data(plan.markets)
+
+    rolling = None
+    if HISTORY_ENABLED:
+        from result_history import get_result_history, history_keys
+        with metrics.stage("history"):
+            # 计划名称（如 SPY#2）随档案顺序变化，历史按数据源和代码记录
+            rolling = get_result_history().update(results, history_keys(plan.markets))
+
+    for profile in profiles:
+        with metrics.stage("post_process"):
+            ordered = post_process(fan_out(results, plan, profile), profile.display_order)
+        profile_rolling = None
+        if rolling is not None:
+            alias = plan.aliases[profile.name]
+            profile_rolling = {name: rolling[plan_name] for name, plan_name in alias.items() if plan_name in rolling}
+        with contextlib.ExitStack() as stack:
+            sinks = sinks_factory(profile, stack) if sinks_factory else None
+            if not sinks:
+                print(f"\n→ 日报档案：{profile.name}")
+                sinks = [TextSink(sys.stdout)]
+            with metrics.stage("render"):
+                render_report(ordered, crypto_date, us_date, sinks=sinks, markets=profile.markets,
+                              rolling=profile_rolling)
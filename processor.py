@@ -1,15 +1,31 @@
 # processor.py
-from datetime import date, datetime
-from typing import List, Optional, Tuple, Dict
+import contextlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import List, Optional, Tuple, Dict, Union
+import numpy as np
 import pandas as pd
 import pytz
 
-from models import DailyResult
-from config import MARKETS, DISPLAY_ORDER
-from utils import format_date_display, get_latest_completed_session
+from models import DailyResult, ResultTable
+from config import (
+    MARKETS, DISPLAY_ORDER, SOURCE_CONCURRENCY, DEFAULT_SOURCE_CONCURRENCY, MAX_FETCH_WORKERS,
+    YF_BATCH_DOWNLOAD, CALENDAR_TIMEZONES,
+    BAR_STORE_ENABLED, BAR_STORE_OVERLAP_DAYS, BAR_STORE_LOAD_ROWS, CRYPTO_STREAM_ENABLED,
+    MINUTE_STORE_ENABLED, HEDGE_ENABLED
+)
+from minute_store import get_minute_store
+from crypto_stream import load_streamed_day
+from bar_store import get_bar_store
+from utils import format_date_display, get_latest_completed_session, start_run_deadline
+from metrics import stage, annotate
+from hedging import hedged_fetch
 from data_fetchers import (
-    fetch_yf_history, fetch_ak_index, fetch_stock_1m_high_low_time,
-    fetch_crypto_daily, fetch_crypto_high_low_time
+    fetch_daily_from, fetch_stock_1m_high_low_time,
+    fetch_crypto_daily, fetch_crypto_high_low_time,
+    fetch_yf_history_batch, fetch_stock_1m_batch, extract_stock_high_low_time,
+    minute_day_complete, minute_frame_complete,
 )
 
 def get_latest_day_data(df: pd.DataFrame, calendar_name: Optional[str], source: str, result_type: str
@@ -49,85 +65,290 @@ def get_latest_day_data(df: pd.DataFrame, calendar_name: Optional[str], source:
     return latest_day, base_close, trading_date, "ok"
 
 
-def collect_data() -> Tuple[List[DailyResult], Optional[date], Optional[date]]:
-    results = []
-    crypto_report_date = None
-    us_report_date = get_latest_completed_session("XNYS", "yf")
+def compute_session_stats(df: pd.DataFrame, result_type: str) -> pd.DataFrame:
+    """对整段日线做向量化计算，返回每个交易日的高/低/收及相对基准价的百分比。
 
-    for name, cfg in MARKETS.items():
-        print(f"\n获取中：{name}")
+    股票和指数以前一交易日收盘为基准（股票除息日扣除当日分红），加密货币以当日开盘为基准，
+    与 collect_data 中单日计算的口径一致。首行股票/指数没有前收盘，百分比为 NaN。
+    """
+    df = df.sort_index(ascending=True)
+    high = df["High"].astype(float).round(2)
+    low = df["Low"].astype(float).round(2)
+    close = df["Close"].astype(float).round(2)
 
-        if cfg["source"] == "binance":
-            daily_result = fetch_crypto_daily(cfg["symbol"], name)
-            if daily_result is None:
-                results.append(DailyResult(
-                    name=name, high=None, high_time="", high_pct=None, low=None, low_time="", low_pct=None,
-                    close=None, close_pct=None, amplitude_pct=None, result_type="crypto",
-                    date_str="", status="stale"
-                ))
-                continue
+    if result_type == "crypto":
+        base = df["Open"].astype(float).round(2)
+    else:
+        base = df["Close"].astype(float).shift(1)
+        if result_type == "stock" and "Dividends" in df.columns:
+            dividends = df["Dividends"].astype(float).fillna(0.0)
+            base = base - dividends.where(dividends > 0, 0.0)
 
-            dt, open_p, high, low, close = daily_result
-            if crypto_report_date is None:
-                crypto_report_date = dt
-
-            start_ms = int(datetime.combine(dt, datetime.min.time())
-                           .replace(tzinfo=pytz.UTC).timestamp() * 1000)
-            high_low_time = fetch_crypto_high_low_time(cfg["symbol"], start_ms, name)
-            high_t, low_t = high_low_time if high_low_time else ("", "")
-
-            status = "ok" if (high_t and high_t != "" and low_t and low_t != "") else "partial"
-
-            results.append(DailyResult(
-                name=name, high=high, high_time=high_t,
-                high_pct=round((high - open_p) / open_p * 100, 2) if open_p and open_p != 0 else None,
-                low=low, low_time=low_t,
-                low_pct=round((low - open_p) / open_p * 100, 2) if open_p and open_p != 0 else None,
-                close=close,
-                close_pct=round((close - open_p) / open_p * 100, 2) if open_p and open_p != 0 else None,
-                amplitude_pct=round((high - low) / open_p * 100, 2) if open_p and open_p != 0 else None,
-                result_type="crypto", date_str=format_date_display(dt), status=status
-            ))
-            continue
+    stats = pd.DataFrame({"High": high, "Low": low, "Close": close, "base_close": base}, index=df.index)
+    for col, values in _pct_columns(high.to_numpy(), low.to_numpy(), close.to_numpy(), base.to_numpy()).items():
+        stats[col] = values
+    return stats
+
+
+def _pct_columns(high: np.ndarray, low: np.ndarray, close: np.ndarray, base: np.ndarray) -> Dict[str, np.ndarray]:
+    """相对基准价的高/低/收/振幅百分比（保留两位小数），基准缺失或为 0 时为 NaN。"""
+    valid = ~np.isnan(base) & (base != 0)
+    safe_base = np.where(valid, base, 1.0)
+
+    def _pct(values: np.ndarray) -> np.ndarray:
+        return np.where(valid, np.round(values / safe_base * 100, 2), np.nan)
+
+    return {
+        "high_pct": _pct(high - base),
+        "low_pct": _pct(low - base),
+        "close_pct": _pct(close - base),
+        "amplitude_pct": _pct(high - low),
+    }
+
+
+def build_result_table(rows: List[Dict]) -> ResultTable:
+    """把各标的的原始行（高/低/收 + 基准价）一次性装入列式结果表，百分比按列向量化计算。"""
+    frame = pd.DataFrame(rows, columns=["name", "high", "high_time", "low", "low_time", "close", "base",
+                                        "result_type", "date_str", "status"])
+    prices = {col: frame[col].astype("float64").to_numpy() for col in ("high", "low", "close", "base")}
+    for col, values in _pct_columns(prices["high"], prices["low"], prices["close"], prices["base"]).items():
+        frame[col] = values
+    return ResultTable(frame)
+
+
+def _raw_row(name: str, result_type: str, high: Optional[float] = None, low: Optional[float] = None,
+             close: Optional[float] = None, base: Optional[float] = None, high_time: str = "",
+             low_time: str = "", date_str: str = "", status: str = "stale") -> Dict:
+    return {"name": name, "high": high, "high_time": high_time, "low": low, "low_time": low_time,
+            "close": close, "base": base, "result_type": result_type, "date_str": date_str, "status": status}
+
+
+def _collect_crypto(name: str, cfg: Dict) -> Tuple[Dict, Optional[date]]:
+    if CRYPTO_STREAM_ENABLED:
+        # 流式聚合已完成前一 UTC 日时直接使用，无需再下载日线和分钟线
+        yesterday = (datetime.now(tz=pytz.UTC) - timedelta(days=1)).date()
+        streamed = load_streamed_day(cfg["symbol"], yesterday)
+        if streamed is not None:
+            dt, open_p, high, low, close, high_t, low_t = streamed
+            print(f"→ {name} 使用流式聚合结果")
+            return _raw_row(name, "crypto", high=high, low=low, close=close, base=open_p,
+                            high_time=high_t, low_time=low_t, date_str=format_date_display(dt),
+                            status="ok"), dt
+
+    with stage("fetch_daily", symbol=name, source="binance"):
+        daily_result = fetch_crypto_daily(cfg["symbol"], name)
+    if daily_result is None:
+        return _raw_row(name, "crypto"), None
+
+    dt, open_p, high, low, close = daily_result
+
+    start_ms = int(datetime.combine(dt, datetime.min.time())
+                   .replace(tzinfo=pytz.UTC).timestamp() * 1000)
+    with stage("fetch_extreme_time", symbol=name, source="binance"):
+        high_low_time = fetch_crypto_high_low_time(cfg["symbol"], start_ms, name)
+    high_t, low_t, complete = high_low_time if high_low_time else ("", "", False)
+
+    # 分钟线补拉后仍有较多缺口时标记为 partial
+    status = "ok" if (high_t and low_t and complete) else "partial"
+
+    # 加密货币以当日开盘价为基准
+    return _raw_row(name, "crypto", high=high, low=low, close=close, base=open_p,
+                    high_time=high_t, low_time=low_t, date_str=format_date_display(dt), status=status), dt
+
+
+def _store_key(cfg: Dict) -> str:
+    return cfg.get("symbol") or cfg["ak_symbol"]
+
+
+def _store_plan(cfg: Dict) -> Tuple[Optional[pd.DataFrame], bool, Optional[date]]:
+    """返回 (缓存 K 线, 是否需要请求上游, 增量拉取起始日)。"""
+    if not BAR_STORE_ENABLED:
+        return None, True, None
+
+    cached = get_bar_store().load(cfg["source"], _store_key(cfg), "1d", limit=BAR_STORE_LOAD_ROWS)
+    if cached is None or cached.empty:
+        return None, True, None
+
+    last_date = cached.index[-1].date()
+    completed_date = get_latest_completed_session(cfg.get("calendar"), cfg["source"])
+    if completed_date is not None and last_date >= completed_date and len(cached) >= 2:
+        return cached, False, None
+    return cached, True, last_date - timedelta(days=BAR_STORE_OVERLAP_DAYS)
 
-        calendar = cfg.get("calendar")
-        source = cfg["source"]
-        df = (fetch_yf_history(cfg["symbol"]) if source == "yf"
-              else fetch_ak_index(cfg["ak_symbol"], "ak_hk" if source == "ak_hk" else "ak"))
 
-        latest_day, base_close, trading_date, status = get_latest_day_data(df, calendar, source, cfg["type"])
+def _load_daily(name: str, cfg: Dict, prefetched: Dict[str, Dict]) -> Optional[pd.DataFrame]:
+    source = cfg["source"]
+    cached, need_fetch, start = prefetched["plans"].get(name) or _store_plan(cfg)
+    if not need_fetch:
+        print(f"→ {name} 本地缓存已是最新，跳过上游请求")
+        return cached
 
-        if latest_day is None:
-            results.append(DailyResult(
-                name=name, high=None, high_time="", high_pct=None, low=None, low_time="", low_pct=None,
-                close=None, close_pct=None, amplitude_pct=None, result_type=cfg["type"],
-                date_str="", status="stale"
-            ))
+    with stage("fetch_daily", symbol=name, source=source):
+        # 优先使用 yf 批量下载结果，缺失时退回单标的请求
+        df = prefetched["daily"].get(cfg["symbol"]) if source == "yf" else None
+        if df is None and HEDGE_ENABLED and cfg.get("backups"):
+            # 备用源与主源数据已统一格式，胜出的一方都写入主源的缓存
+            candidates = [(spec["source"], partial(fetch_daily_from, spec, start))
+                          for spec in [cfg] + cfg["backups"]]
+            df, winner = hedged_fetch(candidates, name, min_rows=1 if start else 2)
+            if winner is not None:
+                annotate(winner=winner)
+        elif df is None:
+            df = fetch_daily_from(cfg, start)
+
+    completed_date = get_latest_completed_session(cfg.get("calendar"), source)
+    if df is None:
+        if cached is not None and completed_date is not None and cached.index[-1].date() >= completed_date:
+            print(f"  → {name} 上游获取失败，使用本地缓存")
+            return cached
+        # 缓存未覆盖最新已完成交易日时不能当作最新数据，按获取失败处理（stale）
+        if cached is not None:
+            print(f"  → {name} 上游获取失败，本地缓存未到最新交易日")
+        return None
+
+    if not BAR_STORE_ENABLED:
+        return df
+    store = get_bar_store()
+    store.upsert(source, _store_key(cfg), "1d", df, through=completed_date)
+    return store.load(source, _store_key(cfg), "1d", limit=BAR_STORE_LOAD_ROWS)
+
+
+def _collect_market(name: str, cfg: Dict, prefetched: Dict[str, Dict]) -> Dict:
+    calendar = cfg.get("calendar")
+    source = cfg["source"]
+    df = _load_daily(name, cfg, prefetched)
+
+    latest_day, base_close, trading_date, status = get_latest_day_data(df, calendar, source, cfg["type"])
+
+    if latest_day is None:
+        return _raw_row(name, cfg["type"])
+
+    high_t, low_t = ("", "")
+    if source == "yf" and MINUTE_STORE_ENABLED:
+        stored = get_minute_store().extreme_times(cfg["symbol"], trading_date, _calendar_tz(calendar))
+        if stored is not None:
+            high_t, low_t = stored
+    if cfg["type"] == "stock" and not high_t:
+        minute_df = prefetched["minute"].get(cfg["symbol"])
+        high_low_time = None
+        # 批量结果中该日不完整时按缺口补拉，而不是用残缺的分钟线以 ok 状态输出
+        if minute_df is not None and minute_frame_complete(minute_df, calendar, trading_date):
+            high_low_time = extract_stock_high_low_time(minute_df, trading_date, calendar)
+        if high_low_time is None:
+            with stage("fetch_extreme_time", symbol=name, source=source):
+                high_t, low_t, complete = fetch_stock_1m_high_low_time(cfg["symbol"], trading_date, calendar)
+            if not complete:
+                status = "partial"
+        else:
+            high_t, low_t = high_low_time
+
+    return _raw_row(name, cfg["type"], high=latest_day["High"], low=latest_day["Low"],
+                    close=latest_day["Close"], base=base_close, high_time=high_t, low_time=low_t,
+                    date_str=format_date_display(trading_date) if trading_date else "", status=status)
+
+
+def _calendar_tz(calendar: Optional[str]) -> str:
+    return CALENDAR_TIMEZONES.get(calendar, "America/New_York")
+
+
+def _no_prefetch() -> Dict[str, Dict]:
+    return {"daily": {}, "minute": {}, "plans": {}}
+
+
+def _prefetch_yf(markets: Dict[str, Dict]) -> Dict[str, Dict]:
+    plans = {name: _store_plan(cfg) for name, cfg in markets.items() if cfg["source"] == "yf"}
+    prefetched = {"daily": {}, "minute": {}, "plans": plans}
+    if not YF_BATCH_DOWNLOAD:
+        return prefetched
+
+    yf_cfgs = [cfg for cfg in markets.values() if cfg["source"] == "yf"]
+    # 只批量拉取缓存未覆盖最新交易日的标的；全部有缓存时从最早的增量起始日开始拉
+    stale = [(cfg, plans[name][2]) for name, cfg in markets.items()
+             if cfg["source"] == "yf" and plans[name][1]]
+    if stale:
+        starts = [start for _, start in stale]
+        batch_start = None if any(s is None for s in starts) else min(starts)
+        with stage("fetch_daily_batch", source="yf"):
+            prefetched["daily"] = fetch_yf_history_batch([cfg["symbol"] for cfg, _ in stale], start=batch_start)
+
+    # 开启分钟线存储时指数也计算极值时间；已存有最新交易日分钟线的标的不再下载
+    by_calendar: Dict[Optional[str], List[str]] = {}
+    expected_days: Dict[str, Optional[date]] = {}
+    for cfg in yf_cfgs:
+        if cfg["type"] != "stock" and not MINUTE_STORE_ENABLED:
             continue
+        if MINUTE_STORE_ENABLED:
+            expected = get_latest_completed_session(cfg.get("calendar"), "yf")
+            if expected is not None and get_minute_store().has_day(cfg["symbol"], expected):
+                continue
+            expected_days[cfg["symbol"]] = expected
+        by_calendar.setdefault(cfg.get("calendar"), []).append(cfg["symbol"])
+
+    # 分钟线按交易所分组批量下载，保证交易时段的过滤基于本地时间
+    for calendar, symbols in by_calendar.items():
+        with stage("fetch_1m_batch", source="yf"):
+            frames = fetch_stock_1m_batch(symbols, tz=_calendar_tz(calendar))
+        prefetched["minute"].update(frames)
+        if MINUTE_STORE_ENABLED:
+            for symbol, df in frames.items():
+                get_minute_store().append_frame(
+                    symbol, df, calendar, through=expected_days.get(symbol),
+                    is_complete=lambda day, ts, c=calendar: minute_day_complete(ts, c, day),
+                )
+    return prefetched
+
+
+def _collect_one(name: str, cfg: Dict, prefetch: Future) -> Tuple[Dict, Optional[date]]:
+    prefetched = _no_prefetch()
+    if cfg["source"] == "yf":
+        # 只有 yf 标的等待批量预取，其他数据源不受其耗时影响
+        try:
+            prefetched = prefetch.result()
+        except Exception as e:
+            print(f"  → yf 批量预取异常，逐个获取: {type(e).__name__}: {e}")
+    print(f"\n获取中：{name}")
+    try:
+        if cfg["source"] == "binance":
+            return _collect_crypto(name, cfg)
+        return _collect_market(name, cfg, prefetched), None
+    except Exception as e:
+        print(f"  → {name} 处理异常: {type(e).__name__}: {e}")
+        return _raw_row(name, cfg["type"]), None
 
-        high_t, low_t = ("", "")
-        if cfg["type"] == "stock":
-            high_t, low_t = fetch_stock_1m_high_low_time(cfg["symbol"], trading_date)
-
-        results.append(DailyResult(
-            name=name,
-            high=latest_day["High"], high_time=high_t,
-            high_pct=round((latest_day["High"] - base_close) / base_close * 100, 2) if base_close and base_close != 0 else None,
-            low=latest_day["Low"], low_time=low_t,
-            low_pct=round((latest_day["Low"] - base_close) / base_close * 100, 2) if base_close and base_close != 0 else None,
-            close=latest_day["Close"],
-            close_pct=round((latest_day["Close"] - base_close) / base_close * 100, 2) if base_close and base_close != 0 else None,
-            amplitude_pct=round((latest_day["High"] - latest_day["Low"]) / base_close * 100, 2) if base_close and base_close != 0 else None,
-            result_type=cfg["type"],
-            date_str=format_date_display(trading_date) if trading_date else "",
-            status=status
+
+def open_source_pools(stack: contextlib.ExitStack, markets: Dict[str, Dict]) -> Dict[str, ThreadPoolExecutor]:
+    """每个数据源一个有界线程池：并发数即该源的上限，排队等待慢数据源的任务不占用其他数据源的线程。"""
+    return {
+        source: stack.enter_context(ThreadPoolExecutor(
+            max_workers=max(1, min(SOURCE_CONCURRENCY.get(source, DEFAULT_SOURCE_CONCURRENCY), MAX_FETCH_WORKERS)),
+            thread_name_prefix=f"fetch-{source}",
         ))
+        for source in {cfg["source"] for cfg in markets.values()}
+    }
+
+
+def collect_data(markets: Optional[Dict[str, Dict]] = None
+                 ) -> Tuple[ResultTable, Optional[date], Optional[date]]:
+    markets = MARKETS if markets is None else markets
+    start_run_deadline()
+    us_report_date = get_latest_completed_session("XNYS", "yf")
+
+    with contextlib.ExitStack() as stack:
+        pools = open_source_pools(stack, markets)
+        # yf 批量预取在独立线程中进行，与 akshare/Binance 的获取同时开始
+        prefetch_pool = stack.enter_context(ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch-yf"))
+        prefetch = prefetch_pool.submit(_prefetch_yf, markets)
+        futures = [pools[cfg["source"]].submit(_collect_one, name, cfg, prefetch)
+                   for name, cfg in markets.items()]
+        # 按 MARKETS 顺序收集结果，保证输出顺序与串行版本一致
+        outcomes = [f.result() for f in futures]
+
+    results = build_result_table([row for row, _ in outcomes])
+    crypto_report_date = next((dt for _, dt in outcomes if dt is not None), None)
 
     return results, crypto_report_date, us_report_date
 
 
-def post_process(results: List[DailyResult]) -> List[DailyResult]:
-    order_map = {name: i for i, name in enumerate(DISPLAY_ORDER)}
-    max_order = max(order_map.values()) if order_map else -1
-    fallback_order = max_order + 1
-    return sorted(results, key=lambda x: order_map.get(x.name, fallback_order))
\ No newline at end of file
+def post_process(results: Union[ResultTable, List[DailyResult]],
+                 display_order: Optional[List[str]] = None) -> ResultTable:
+    return ResultTable.from_results(results).reorder(DISPLAY_ORDER if display_order is None else display_order)
\ No newline at end of file
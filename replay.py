@@ -0,0 +1,104 @@
+# replay.py
+import copy
+import functools
+import hashlib
+import os
+import pickle
+import random
+import threading
+import time as time_module
+from typing import Any, Callable, Dict, Optional
+
+from config import FETCH_MODE, FIXTURE_DIR
+
+# 运行模式：live 直接请求上游；record 请求上游并把结果写入 fixture；replay 只从 fixture 读取
+_state: Dict[str, Any] = {
+    "mode": FETCH_MODE,
+    "fixture_dir": FIXTURE_DIR,
+    "latency": 0.0,
+    "latency_jitter": 0.0,
+    "failure_rate": 0.0,
+    "provider": None,
+}
+_lock = threading.Lock()
+_rng = random.Random(0)
+
+
+def configure(mode: Optional[str] = None, fixture_dir: Optional[str] = None,
+              latency: Optional[float] = None, latency_jitter: Optional[float] = None,
+              failure_rate: Optional[float] = None, provider: Optional[Callable] = None,
+              seed: Optional[int] = None):
+    """调整录制/回放参数。provider(func_name, args, kwargs) 用于在 fixture 缺失时合成数据。"""
+    with _lock:
+        for key, value in (("mode", mode), ("fixture_dir", fixture_dir), ("latency", latency),
+                           ("latency_jitter", latency_jitter), ("failure_rate", failure_rate),
+                           ("provider", provider)):
+            if value is not None:
+                _state[key] = value
+        if seed is not None:
+            _rng.seed(seed)
+
+
+def _fixture_paths(func_name: str, args: tuple, kwargs: dict):
+    call_key = repr((args, sorted(kwargs.items())))
+    digest = hashlib.sha1(call_key.encode("utf-8")).hexdigest()[:16]
+    # 第二个文件只按函数名 + 第一个参数（通常是标的）索引，日期类参数变化时用作回退
+    head = repr(args[0]) if args else ""
+    head_digest = hashlib.sha1(head.encode("utf-8")).hexdigest()[:16]
+    base = _state["fixture_dir"]
+    return (os.path.join(base, f"{func_name}-{digest}.pkl"),
+            os.path.join(base, f"{func_name}-latest-{head_digest}.pkl"))
+
+
+def _write_fixture(paths, result):
+    os.makedirs(_state["fixture_dir"], exist_ok=True)
+    payload = pickle.dumps(result)
+    for path in paths:
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+
+def _read_fixture(paths):
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return pickle.load(f)
+    raise KeyError(paths[0])
+
+
+def _replay(func_name: str, args: tuple, kwargs: dict, failure_value):
+    with _lock:
+        delay = _state["latency"] + _rng.uniform(0, _state["latency_jitter"])
+        failed = _rng.random() < _state["failure_rate"]
+    if delay > 0:
+        time_module.sleep(delay)
+    if failed:
+        print(f"  → [回放] {func_name} 模拟失败")
+        return copy.copy(failure_value)
+
+    try:
+        return _read_fixture(_fixture_paths(func_name, args, kwargs))
+    except KeyError:
+        provider = _state["provider"]
+        if provider is None:
+            print(f"  → [回放] {func_name}{args} 缺少 fixture")
+            return copy.copy(failure_value)
+        return provider(func_name, args, kwargs)
+
+
+def recordable(failure_value=None):
+    """包装数据获取函数：按当前模式直连、录制或回放。failure_value 是该函数失败时的返回值。"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            mode = _state["mode"]
+            if mode == "replay":
+                return _replay(func.__name__, args, kwargs, failure_value)
+            result = func(*args, **kwargs)
+            if mode == "record" and result is not None:
+                _write_fixture(_fixture_paths(func.__name__, args, kwargs), result)
+            return result
+        return wrapper
+    return decorator
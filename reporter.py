@@ -1,8 +1,12 @@
 # reporter.py
+import html
+import json
+import sys
 from datetime import date
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, TextIO
 
-from models import DailyResult
+from models import DailyResult, ResultTable
+from config import MARKETS, REGIONS, CALENDAR_TIME_LABELS, AMPLITUDE_WINDOWS, EXTREME_WINDOW
 
 def _val(v: Optional[float], fmt: str = ".1f", default: str = "-") -> str:
     return f"{v:{fmt}}" if v is not None else default
@@ -15,65 +19,203 @@ def _pct_change(pct: float) -> str:
     else:
         return f"{pct:.2f}%"
 
-def render_report(results: List[DailyResult], crypto_report_date: Optional[date], us_report_date: Optional[date]):
-    dates = sorted(
-        {r.date_str for r in results if r.date_str},
-        key=lambda x: x.split("（")[0],
-        reverse=True
-    )
+REPORT_TITLE = "市场日报"
+_STATUS_SUFFIX = {"partial": "（数据部分缺失）", "stale": "（数据陈旧）"}
 
-    print("\n" + "=" * 80)
-    print("                             市场日报")
-    print("=" * 80)
 
-    us_market = [r for r in results if r.name in ["QQQ", "SPY", "DIA", "纳指", "SPX", "道指", "罗素2000"]]
-    crypto_market = [r for r in results if r.name in ["BTC", "ETH"]]
-    asia_market = [r for r in results if r.name in ["恒科", "恒生", "上证", "日经"]]
+class ReportSink:
+    """日报输出端。render_report 单次遍历结果，依次回调各输出端；每行正文只构建一次，由各端共享。"""
 
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def begin(self):
+        pass
+
+    def date(self, date_str: str):
+        pass
+
+    def region(self, region: str, title: str):
+        pass
+
+    def line(self, result: DailyResult, text: str):
+        pass
+
+    def end_region(self):
+        pass
+
+    def end_date(self):
+        pass
+
+    def end(self):
+        pass
+
+
+class TextSink(ReportSink):
+    def begin(self):
+        self.stream.write("\n" + "=" * 80 + "\n")
+        self.stream.write(f"                             {REPORT_TITLE}\n")
+        self.stream.write("=" * 80 + "\n")
+
+    def date(self, date_str: str):
+        self.stream.write(f"【{date_str}】\n\n")
+
+    def region(self, region: str, title: str):
+        self.stream.write(f"【{title}】\n")
+
+    def line(self, result: DailyResult, text: str):
+        self.stream.write(text + "\n")
+
+    def end_region(self):
+        self.stream.write("\n")
+
+
+class MarkdownSink(ReportSink):
+    def begin(self):
+        self.stream.write(f"# {REPORT_TITLE}\n\n")
+
+    def date(self, date_str: str):
+        self.stream.write(f"## {date_str}\n\n")
+
+    def region(self, region: str, title: str):
+        self.stream.write(f"### {title}\n\n")
+
+    def line(self, result: DailyResult, text: str):
+        self.stream.write(f"- {text}\n")
+
+    def end_region(self):
+        self.stream.write("\n")
+
+
+class HtmlSink(ReportSink):
+    def begin(self):
+        self.stream.write(f"<article class=\"daily-report\">\n<h1>{html.escape(REPORT_TITLE)}</h1>\n")
+
+    def date(self, date_str: str):
+        self.stream.write(f"<section>\n<h2>{html.escape(date_str)}</h2>\n")
+
+    def region(self, region: str, title: str):
+        self.stream.write(f"<h3>{html.escape(title)}</h3>\n<ul class=\"region-{html.escape(region)}\">\n")
+
+    def line(self, result: DailyResult, text: str):
+        self.stream.write(f"<li class=\"status-{html.escape(result.status)}\">{html.escape(text)}</li>\n")
+
+    def end_region(self):
+        self.stream.write("</ul>\n")
+
+    def end_date(self):
+        self.stream.write("</section>\n")
+
+    def end(self):
+        self.stream.write("</article>\n")
+
+
+class JsonSink(ReportSink):
+    """边渲染边写出一个 JSON 文档：{"title", "dates": [{"date", "regions": [{"region", "items"}]}]}。
+
+    每份日报占一行；回填时每个交易日各一份，输出文件即 JSON Lines。
+    """
+
+    def begin(self):
+        self.stream.write(json.dumps({"title": REPORT_TITLE}, ensure_ascii=False)[:-1] + ', "dates": [')
+        self._first_date = True
+
+    def date(self, date_str: str):
+        self.stream.write(("" if self._first_date else ", ")
+                          + json.dumps({"date": date_str}, ensure_ascii=False)[:-1] + ', "regions": [')
+        self._first_date = False
+        self._first_region = True
+
+    def region(self, region: str, title: str):
+        self.stream.write(("" if self._first_region else ", ")
+                          + json.dumps({"region": region, "title": title}, ensure_ascii=False)[:-1]
+                          + ', "items": [')
+        self._first_region = False
+        self._first_item = True
+
+    def line(self, result: DailyResult, text: str):
+        item = {
+            "name": result.name, "type": result.result_type, "status": result.status,
+            "high": result.high, "high_time": result.high_time, "high_pct": result.high_pct,
+            "low": result.low, "low_time": result.low_time, "low_pct": result.low_pct,
+            "close": result.close, "close_pct": result.close_pct, "amplitude_pct": result.amplitude_pct,
+            "text": text,
+        }
+        self.stream.write(("" if self._first_item else ", ") + json.dumps(item, ensure_ascii=False))
+        self._first_item = False
+
+    def end_region(self):
+        self.stream.write("]}")
+
+    def end_date(self):
+        self.stream.write("]}")
+
+    def end(self):
+        self.stream.write("]}\n")
+
+
+def _format_rolling(stats: Dict) -> str:
+    parts = [f"{w}日均振幅{stats[f'avg_amplitude_{w}']:.2f}%" for w in AMPLITUDE_WINDOWS
+             if f"avg_amplitude_{w}" in stats]
+    if stats.get("new_high"):
+        parts.append(f"创{EXTREME_WINDOW}日新高")
+    if stats.get("new_low"):
+        parts.append(f"创{EXTREME_WINDOW}日新低")
+    streak = stats.get("streak", 0)
+    if abs(streak) >= 2:
+        parts.append(f"连涨{streak}日" if streak > 0 else f"连跌{-streak}日")
+    return f"近期：{'，'.join(parts)}。" if parts else ""
+
+
+def _format_line(r: DailyResult, region_cfg: Dict, stats: Optional[Dict] = None,
+                 calendar: Optional[str] = None) -> str:
+    unit = region_cfg["unit"].get(r.result_type, "")
+    time_prefix = region_cfg["time_prefix"].get(r.result_type) or CALENDAR_TIME_LABELS.get(calendar, "")
+    line = f"{r.name}{_STATUS_SUFFIX.get(r.status, '')}: "
+    high_str = f"最高：{r.high}{unit}" + (f"，{time_prefix}{r.high_time}触及" if r.high_time else "") + f"，{_pct_change(r.high_pct)}"
+    low_str = f"；最低：{r.low}{unit}" + (f"，{time_prefix}{r.low_time}触及" if r.low_time else "") + f"，{_pct_change(r.low_pct)}"
+    close_str = f"；收盘：{r.close}{unit}，{_pct_change(r.close_pct)}"
+    amp_str = f"；振幅：{r.amplitude_pct:.2f}%。"
+    return line + high_str + low_str + close_str + amp_str + (_format_rolling(stats) if stats else "")
+
+
+def render_report(results: Iterable[DailyResult], crypto_report_date: Optional[date], us_report_date: Optional[date],
+                  sinks: Optional[List[ReportSink]] = None, markets: Optional[Dict[str, Dict]] = None,
+                  rolling: Optional[Dict[str, Dict]] = None):
+    """rolling 为 名称 → 滚动统计摘要（见 result_history），提供时在每行末尾附加近期统计。"""
+    sinks = [TextSink(sys.stdout)] if sinks is None else sinks
+    markets = MARKETS if markets is None else markets
+    rolling = rolling or {}
+
+    # 按 (日期, 地区) 分组建立行位置索引，地区归属取自 MARKETS 的 region 字段；只为实际输出的行构建 DailyResult
+    table = ResultTable.from_results(results)
+    regions = table.frame["name"].map(lambda name: markets.get(name, {}).get("region"))
+    index: Dict[str, Dict[str, List[int]]] = {}
+    for (date_str, region), positions in table.group_index(["date_str", regions]).items():
+        if date_str and region in REGIONS:
+            index.setdefault(date_str, {})[region] = positions
+
+    dates = sorted(index, key=lambda x: x.split("（")[0], reverse=True)
+
+    for sink in sinks:
+        sink.begin()
     for d in dates:
-        print(f"【{d}】\n")
-
-        us_results = [res for res in us_market if res.date_str == d]
-        if us_results:
-            print("【美国市场】")
-            for r in us_results:
-                unit = "美元" if r.result_type == "stock" else ""
-                time_prefix = "美东时间" if r.result_type == "stock" else ""
-                status_suffix = {"partial": "（数据部分缺失）", "stale": "（数据陈旧）"}.get(r.status, "")
-                line = f"{r.name}{status_suffix}: "
-                high_str = f"最高：{r.high}{unit}" + (f"，{time_prefix}{r.high_time}触及" if r.high_time else "") + f"，{_pct_change(r.high_pct)}"
-                low_str = f"；最低：{r.low}{unit}" + (f"，{time_prefix}{r.low_time}触及" if r.low_time else "") + f"，{_pct_change(r.low_pct)}"
-                close_str = f"；收盘：{r.close}{unit}，{_pct_change(r.close_pct)}"
-                amp_str = f"；振幅：{r.amplitude_pct:.2f}%。"
-                print(line + high_str + low_str + close_str + amp_str)
-            print("")
-
-        crypto_results = [res for res in crypto_market if res.date_str == d]
-        if crypto_results:
-            print("【加密货币】")
-            for r in crypto_results:
-                unit = "美元"
-                time_prefix = "北京时间"
-                status_suffix = {"partial": "（数据部分缺失）", "stale": "（数据陈旧）"}.get(r.status, "")
-                line = f"{r.name}{status_suffix}: "
-                high_str = f"最高：{r.high}{unit}" + (f"，{time_prefix}{r.high_time}触及" if r.high_time else "") + f"，{_pct_change(r.high_pct)}"
-                low_str = f"；最低：{r.low}{unit}" + (f"，{time_prefix}{r.low_time}触及" if r.low_time else "") + f"，{_pct_change(r.low_pct)}"
-                close_str = f"；收盘：{r.close}{unit}，{_pct_change(r.close_pct)}"
-                amp_str = f"；振幅：{r.amplitude_pct:.2f}%。"
-                print(line + high_str + low_str + close_str + amp_str)
-            print("")
-
-        asia_results = [res for res in asia_market if res.date_str == d]
-        if asia_results:
-            print("【亚洲市场】")
-            for r in asia_results:
-                unit = ""
-                time_prefix = ""
-                status_suffix = {"partial": "（数据部分缺失）", "stale": "（数据陈旧）"}.get(r.status, "")
-                line = f"{r.name}{status_suffix}: "
-                high_str = f"最高：{r.high}{unit}" + (f"，{time_prefix}{r.high_time}触及" if r.high_time else "") + f"，{_pct_change(r.high_pct)}"
-                low_str = f"；最低：{r.low}{unit}" + (f"，{time_prefix}{r.low_time}触及" if r.low_time else "") + f"，{_pct_change(r.low_pct)}"
-                close_str = f"；收盘：{r.close}{unit}，{_pct_change(r.close_pct)}"
-                amp_str = f"；振幅：{r.amplitude_pct:.2f}%。"
-                print(line + high_str + low_str + close_str + amp_str)
-            print("")
\ No newline at end of file
+        for sink in sinks:
+            sink.date(d)
+        for region, region_cfg in REGIONS.items():
+            positions = index[d].get(region)
+            if positions is None or len(positions) == 0:
+                continue
+            for sink in sinks:
+                sink.region(region, region_cfg["title"])
+            for i in positions:
+                r = table[i]
+                text = _format_line(r, region_cfg, rolling.get(r.name), markets.get(r.name, {}).get("calendar"))
+                for sink in sinks:
+                    sink.line(r, text)
+            for sink in sinks:
+                sink.end_region()
+        for sink in sinks:
+            sink.end_date()
+    for sink in sinks:
+        sink.end()
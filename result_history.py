@@ -0,0 +1,160 @@
+# result_history.py
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from dataclasses import astuple, replace
+from typing import Dict, Iterable, Optional
+
+from models import DailyResult, RESULT_FIELDS, FLOAT_FIELDS
+from config import HISTORY_PATH, AMPLITUDE_WINDOWS, EXTREME_WINDOW
+
+
+class RollingState:
+    """单个标的的滚动统计，每个新交易日 O(1)（均摊）更新。
+
+    - 各窗口的振幅滑动和（deque 保存最近 max(AMPLITUDE_WINDOWS) 个值）
+    - EXTREME_WINDOW 日最高/最低：单调队列，队首即窗口内极值
+    - 连涨/连跌天数：正数为连涨，负数为连跌
+    """
+
+    def __init__(self, data: Optional[Dict] = None):
+        data = data or {}
+        self.last_session: Optional[str] = data.get("last_session")
+        self.count: int = data.get("count", 0)
+        self.amplitudes = deque(data.get("amplitudes", []), maxlen=max(AMPLITUDE_WINDOWS))
+        self.sums: Dict[int, float] = {int(w): s for w, s in data.get("sums", {}).items()}
+        self.high_queue = deque(data.get("high_queue", []))
+        self.low_queue = deque(data.get("low_queue", []))
+        self.streak: int = data.get("streak", 0)
+        self.is_new_high = data.get("is_new_high", False)
+        self.is_new_low = data.get("is_new_low", False)
+
+    def to_dict(self) -> Dict:
+        return {
+            "last_session": self.last_session, "count": self.count,
+            "amplitudes": list(self.amplitudes), "sums": self.sums,
+            "high_queue": list(self.high_queue), "low_queue": list(self.low_queue),
+            "streak": self.streak, "is_new_high": self.is_new_high, "is_new_low": self.is_new_low,
+        }
+
+    def push(self, session: str, r: DailyResult):
+        seq = self.count
+        self.count += 1
+        self.last_session = session
+
+        if r.amplitude_pct is not None:
+            for w in AMPLITUDE_WINDOWS:
+                if len(self.amplitudes) >= w:
+                    self.sums[w] = self.sums.get(w, 0.0) - self.amplitudes[-w]
+                self.sums[w] = self.sums.get(w, 0.0) + r.amplitude_pct
+            self.amplitudes.append(r.amplitude_pct)
+
+        if r.high is not None:
+            while self.high_queue and self.high_queue[-1][1] <= r.high:
+                self.high_queue.pop()
+            self.high_queue.append([seq, r.high])
+        if r.low is not None:
+            while self.low_queue and self.low_queue[-1][1] >= r.low:
+                self.low_queue.pop()
+            self.low_queue.append([seq, r.low])
+        while self.high_queue and self.high_queue[0][0] <= seq - EXTREME_WINDOW:
+            self.high_queue.popleft()
+        while self.low_queue and self.low_queue[0][0] <= seq - EXTREME_WINDOW:
+            self.low_queue.popleft()
+        # 当日就是窗口内极值（队首为当日）且历史已满一个窗口
+        full = self.count >= EXTREME_WINDOW
+        self.is_new_high = full and bool(self.high_queue) and self.high_queue[0][0] == seq
+        self.is_new_low = full and bool(self.low_queue) and self.low_queue[0][0] == seq
+
+        pct = r.close_pct or 0.0
+        if pct > 0:
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+        elif pct < 0:
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+        else:
+            self.streak = 0
+
+    def summary(self) -> Dict:
+        stats: Dict = {"streak": self.streak, "new_high": self.is_new_high, "new_low": self.is_new_low}
+        for w in AMPLITUDE_WINDOWS:
+            if len(self.amplitudes) >= w:
+                stats[f"avg_amplitude_{w}"] = round(self.sums[w] / w, 2)
+        return stats
+
+
+def history_keys(markets: Dict[str, Dict]) -> Dict[str, str]:
+    """名称 → 历史键（数据源:代码）；同一标的在不同档案或重命名后仍共用同一份历史。"""
+    return {name: f"{cfg['source']}:{cfg.get('symbol') or cfg['ak_symbol']}" for name, cfg in markets.items()}
+
+
+class ResultHistory:
+    """持久化每日计算结果及其滚动统计，新交易日只做增量更新，不需要额外拉取历史行情。"""
+
+    def __init__(self, path: str = HISTORY_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            columns = ", ".join(f"{f} {'REAL' if f in FLOAT_FIELDS else 'TEXT'}"
+                                for f in RESULT_FIELDS)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS results (session TEXT NOT NULL, {columns}, "
+                               "PRIMARY KEY (name, session))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS rolling_state (name TEXT PRIMARY KEY, state TEXT)")
+
+    def _load_state(self, name: str) -> RollingState:
+        row = self._conn.execute("SELECT state FROM rolling_state WHERE name = ?", (name,)).fetchone()
+        return RollingState(json.loads(row[0]) if row else None)
+
+    def _rebuild_state(self, name: str) -> RollingState:
+        # 同一交易日重复写入（如修正数据后重跑）时，从已保存的结果重放以保持统计正确
+        rows = self._conn.execute(
+            f"SELECT session, {', '.join(RESULT_FIELDS)} FROM results WHERE name = ? ORDER BY session", (name,)
+        ).fetchall()
+        state = RollingState()
+        for session, *values in rows:
+            state.push(session, DailyResult(*values))
+        return state
+
+    def update(self, results: Iterable[DailyResult], keys: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+        """写入本次结果并更新滚动统计，返回 名称 → 截至该结果交易日的统计摘要。
+
+        keys 为 名称 → 历史键（见 history_keys），未列出的名称直接作为键。
+        stale 或无日期的结果不写入；早于已有历史的结果（如回填更早的日期）写入后重放状态，但不返回摘要。
+        """
+        keys = keys or {}
+        summaries = {}
+        with self._lock, self._conn:
+            for r in results:
+                if r.status == "stale" or not r.date_str:
+                    continue
+                session = r.date_str[:10]
+                key = keys.get(r.name, r.name)
+                state = self._load_state(key)
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO results VALUES (?, {', '.join('?' * len(RESULT_FIELDS))})",
+                    (session, *astuple(replace(r, name=key))),
+                )
+                if state.last_session is None or session > state.last_session:
+                    state.push(session, r)
+                else:
+                    state = self._rebuild_state(key)
+                self._conn.execute("INSERT OR REPLACE INTO rolling_state VALUES (?, ?)",
+                                   (key, json.dumps(state.to_dict())))
+                if state.last_session == session:
+                    summaries[r.name] = state.summary()
+        return summaries
+
+
+_default_history: Optional[ResultHistory] = None
+_default_lock = threading.Lock()
+
+
+def get_result_history() -> ResultHistory:
+    global _default_history
+    with _default_lock:
+        if _default_history is None:
+            _default_history = ResultHistory()
+        return _default_history
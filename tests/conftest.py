@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# 项目为平铺模块布局，测试直接从仓库根目录导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
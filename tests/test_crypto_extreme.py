@@ -0,0 +1,110 @@
+# test_crypto_extreme.py
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+import data_fetchers
+from data_fetchers import MINUTE_MS, fetch_crypto_high_low_time
+
+DAY_START = int(datetime(2026, 10, 16, tzinfo=pytz.UTC).timestamp() * 1000)
+HOUR_MS = 3600000
+
+
+class FakeBinance:
+    """由一天的 1m K 线生成 1h K 线的假客户端；hourly_override 可注入缺失或不一致的小时线。"""
+
+    def __init__(self, minutes, hourly_override=None):
+        self.minutes = minutes
+        self.hourly_override = hourly_override
+        self.calls = []
+
+    def _hourly(self):
+        hours = []
+        for h in range(24):
+            rows = [m for m in self.minutes if DAY_START + h * HOUR_MS <= m[0] < DAY_START + (h + 1) * HOUR_MS]
+            hours.append([rows[0][0] - rows[0][0] % HOUR_MS, rows[0][1], max(r[2] for r in rows),
+                          min(r[3] for r in rows), rows[-1][4], 1.0])
+        return hours
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append((timeframe, since, limit))
+        if timeframe == "1h":
+            bars = self.hourly_override if self.hourly_override is not None else self._hourly()
+        else:
+            bars = self.minutes
+        return [b for b in bars if b[0] >= since][:limit]
+
+
+def _minutes(seed, step=1.0):
+    # 价格按 step 取整，制造大量相同的最高/最低值
+    rng = np.random.default_rng(seed)
+    close = np.round((100 + np.cumsum(rng.normal(0, 1, 1440))) / step) * step
+    rows = []
+    for i, c in enumerate(close):
+        o = close[i - 1] if i else c
+        rows.append([DAY_START + i * MINUTE_MS, o, max(o, c), min(o, c), c, 1.0])
+    return rows
+
+
+def _full_scan(minutes):
+    df = pd.DataFrame(minutes, columns=["ts", "O", "H", "L", "C", "V"])
+    t = pd.to_datetime(df["ts"], unit="ms", utc=True).dt.tz_convert("Asia/Shanghai")
+    return t[df["H"].idxmax()].strftime("%H:%M"), t[df["L"].idxmin()].strftime("%H:%M")
+
+
+def _run(monkeypatch, client, mode):
+    monkeypatch.setattr(data_fetchers, "get_binance_client", lambda: client)
+    monkeypatch.setattr(data_fetchers, "CRYPTO_EXTREME_SEARCH", mode)
+    return fetch_crypto_high_low_time("BTC/USDT", DAY_START, "BTC")
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("step", [0.01, 1.0, 5.0])
+def test_coarse_matches_full_scan(monkeypatch, seed, step):
+    minutes = _minutes(seed, step)
+    expected = (*_full_scan(minutes), True)
+    client = FakeBinance(minutes)
+    assert _run(monkeypatch, client, "coarse") == expected
+    # 分层搜索只请求一次 1h 和至多两个小时的 1m
+    assert [c[0] for c in client.calls].count("1m") <= 2
+    assert _run(monkeypatch, FakeBinance(minutes), "full") == expected
+
+
+def test_equal_highs_in_different_hours_pick_earliest(monkeypatch):
+    minutes = [[DAY_START + i * MINUTE_MS, 100.0, 101.0, 99.0, 100.0, 1.0] for i in range(1440)]
+    for i in (5 * 60 + 7, 17 * 60 + 2):        # 两个小时内出现相同的最高价
+        minutes[i][2] = 120.0
+    for i in (22 * 60 + 59, 3 * 60 + 30):
+        minutes[i][3] = 80.0
+    expected = (*_full_scan(minutes), True)
+    assert expected[:2] == ("13:07", "11:30")
+    assert _run(monkeypatch, FakeBinance(minutes), "coarse") == expected
+
+
+def test_incomplete_hourly_falls_back_to_full_scan(monkeypatch):
+    minutes = _minutes(7)
+    client = FakeBinance(minutes)
+    client.hourly_override = client._hourly()[:23]
+    assert _run(monkeypatch, client, "coarse") == (*_full_scan(minutes), True)
+    assert ("1m", DAY_START, 1000) in client.calls
+
+
+def test_inconsistent_hourly_falls_back_to_full_scan(monkeypatch):
+    minutes = _minutes(8)
+    client = FakeBinance(minutes)
+    hourly = client._hourly()
+    hourly[3][2] = max(m[2] for m in minutes) + 1   # 小时线最高价在分钟线中找不到
+    client.hourly_override = hourly
+    assert _run(monkeypatch, client, "coarse") == (*_full_scan(minutes), True)
+
+
+def test_missing_minutes_mark_incomplete(monkeypatch):
+    minutes = _minutes(9)
+    del minutes[100:200]
+    client = FakeBinance(minutes)
+    client.hourly_override = []
+    high_t, low_t, complete = _run(monkeypatch, client, "coarse")
+    assert (high_t, low_t) == _full_scan(minutes) and complete is False
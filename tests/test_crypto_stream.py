@@ -0,0 +1,67 @@
+# test_crypto_stream.py
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+import crypto_stream
+from crypto_stream import MINUTE_MS, StreamAggregator, load_streamed_day, simulated_feed
+
+SYMBOL = "BTC/USDT"
+DAY = date(2026, 10, 16)
+DAY_START = int(datetime(2026, 10, 16, tzinfo=pytz.UTC).timestamp() * 1000)
+
+
+@pytest.fixture(autouse=True)
+def stream_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(crypto_stream, "CRYPTO_STREAM_DIR", str(tmp_path))
+
+
+def _klines(seed: int = 0) -> list:
+    # 价格取整到 1，制造大量相同的最高/最低值，检验“首次出现”的口径
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + np.cumsum(rng.normal(0, 1, 1441)))
+    rows = []
+    for i, c in enumerate(close):
+        o = close[i - 1] if i else c
+        rows.append([DAY_START + i * MINUTE_MS, o, max(o, c) + 1, min(o, c) - 1, c, 1.0])
+    return rows  # 1440 根当日 K 线 + 次日第一根（触发当日收盘）
+
+
+def _expected(rows: list) -> tuple:
+    df = pd.DataFrame(rows[:1440], columns=["ts", "open", "high", "low", "close", "volume"])
+    tz = pytz.timezone("Asia/Shanghai")
+    fmt = lambda ts: datetime.fromtimestamp(ts / 1000, tz=tz).strftime("%H:%M")
+    return (DAY, round(df["open"].iloc[0], 2), round(df["high"].max(), 2), round(df["low"].min(), 2),
+            round(df["close"].iloc[-1], 2),
+            fmt(df["ts"][df["high"].idxmax()]), fmt(df["ts"][df["low"].idxmin()]))
+
+
+def test_complete_day_matches_full_scan():
+    rows = _klines()
+    StreamAggregator([SYMBOL], checkpoint_seconds=3600).run(simulated_feed({SYMBOL: rows}))
+    assert load_streamed_day(SYMBOL, DAY) == _expected(rows)
+
+
+def test_checkpoint_resume_and_duplicates():
+    rows = _klines(1)
+    StreamAggregator([SYMBOL]).run(simulated_feed({SYMBOL: rows[:700]}))
+    # 重连后从检查点恢复，并重复推送部分已处理的 K 线
+    StreamAggregator([SYMBOL]).run(simulated_feed({SYMBOL: rows[650:]}))
+    assert load_streamed_day(SYMBOL, DAY) == _expected(rows)
+
+
+@pytest.mark.parametrize("missing", [0, 700, 1439])
+def test_incomplete_day_is_rejected(missing):
+    rows = _klines(2)
+    del rows[missing]
+    StreamAggregator([SYMBOL]).run(simulated_feed({SYMBOL: rows}))
+    assert load_streamed_day(SYMBOL, DAY) is None
+
+
+def test_unfinished_day_is_not_reported():
+    rows = _klines(3)
+    StreamAggregator([SYMBOL]).run(simulated_feed({SYMBOL: rows[:1440]}))
+    assert load_streamed_day(SYMBOL, DAY) is None
@@ -0,0 +1,51 @@
+# tests/test_hedging.py
+import threading
+import time as time_module
+
+import pandas as pd
+
+import hedging
+import metrics
+from config import MAX_FETCH_WORKERS, SOURCE_CONCURRENCY
+from utils import retry_fetch
+
+
+def test_hedged_requests_respect_source_limit_and_stage(tmp_path, monkeypatch):
+    monkeypatch.setattr(hedging, "_default_latency", hedging.SourceLatency(str(tmp_path / "latency.json")))
+    monkeypatch.setattr(hedging, "HEDGE_DEFAULT_DELAY_SECONDS", 0.01)
+    limit = min(SOURCE_CONCURRENCY["ak"], MAX_FETCH_WORKERS)
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def _upstream():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time_module.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        metrics.add("rows", 1)
+        return pd.DataFrame({"Close": [1.0, 2.0]})
+
+    def _slow_primary():
+        time_module.sleep(0.3)
+        return None
+
+    events = []
+
+    def _one(i):
+        with metrics.stage("fetch_daily", symbol=f"S{i}") as event:
+            candidates = [("yf", _slow_primary),
+                          ("ak", lambda: retry_fetch(_upstream, source="ak", max_retries=1))]
+            df, winner = hedging.hedged_fetch(candidates, f"S{i}")
+        assert winner == "ak" and len(df) == 2
+        events.append(event)
+
+    threads = [threading.Thread(target=_one, args=(i,)) for i in range(limit * 3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= limit
+    # 对冲线程里的计数落在调用方的阶段上
+    assert len(events) == limit * 3 and all(e["rows"] >= 1 for e in events)
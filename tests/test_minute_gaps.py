@@ -0,0 +1,134 @@
+# test_minute_gaps.py
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_fetchers
+from data_fetchers import MINUTE_MS, _fill_minute_gaps, _missing_ranges, extract_stock_high_low_time
+from utils import session_breaks_ms
+
+START = 1_760_000_000_000 - 1_760_000_000_000 % MINUTE_MS
+
+
+def _frame(ts) -> pd.DataFrame:
+    ts = np.asarray(ts, dtype=np.int64)
+    return pd.DataFrame({"ts": ts, "High": ts / MINUTE_MS, "Low": -ts / MINUTE_MS})
+
+
+def test_missing_ranges_merges_consecutive_minutes():
+    have = [START + i * MINUTE_MS for i in range(10) if i not in (0, 3, 4, 9)]
+    assert _missing_ranges(have, START, START + 10 * MINUTE_MS) == [
+        (START, START + MINUTE_MS),
+        (START + 3 * MINUTE_MS, START + 5 * MINUTE_MS),
+        (START + 9 * MINUTE_MS, START + 10 * MINUTE_MS),
+    ]
+    assert _missing_ranges(range(START, START + 10 * MINUTE_MS, MINUTE_MS), START, START + 10 * MINUTE_MS) == []
+
+
+def test_missing_ranges_ignores_excluded_break():
+    have = [START + i * MINUTE_MS for i in range(10) if i not in (4, 5, 6)]
+    assert _missing_ranges(have, START, START + 10 * MINUTE_MS,
+                           excluded=[(START + 4 * MINUTE_MS, START + 7 * MINUTE_MS)]) == []
+
+
+def test_fill_gaps_refetches_only_missing_ranges():
+    end = START + 60 * MINUTE_MS
+    holes = {10, 11, 40}
+    calls = []
+
+    def fetch_range(a, b):
+        calls.append((a, b))
+        ts = np.arange(a, b, MINUTE_MS)
+        if len(calls) == 1:
+            ts = [t for t in ts if (t - START) // MINUTE_MS not in holes]
+        return _frame(ts)
+
+    df, missing = _fill_minute_gaps(fetch_range, START, end, "TEST")
+    assert missing == 0
+    assert calls[1:] == [(START + 10 * MINUTE_MS, START + 12 * MINUTE_MS),
+                         (START + 40 * MINUTE_MS, START + 41 * MINUTE_MS)]
+    assert df["ts"].tolist() == list(range(START, end, MINUTE_MS))
+
+
+def test_fill_gaps_stops_when_upstream_has_nothing_new(monkeypatch):
+    monkeypatch.setattr(data_fetchers, "MINUTE_GAP_MAX_ROUNDS", 5)
+    calls = []
+
+    def fetch_range(a, b):
+        calls.append((a, b))
+        return _frame([t for t in range(a, b, MINUTE_MS) if t != START + 5 * MINUTE_MS])
+
+    df, missing = _fill_minute_gaps(fetch_range, START, START + 10 * MINUTE_MS, "TEST")
+    assert missing == 1 and len(calls) == 2 and len(df) == 9
+
+
+def test_incomplete_day_is_not_stored(tmp_path):
+    from minute_store import MinuteStore
+
+    frames = []
+    for day in ("2026-10-15", "2026-10-16"):
+        frames.append(pd.date_range(f"{day} 09:30", f"{day} 15:59", freq="1min", tz="America/New_York"))
+    idx = frames[0].append(frames[1][:200])  # 10-16 只有上午的分钟线
+    df = pd.DataFrame({"High": 1.0, "Low": 1.0, "Close": 1.0}, index=idx)
+
+    store = MinuteStore(str(tmp_path))
+    written = store.append_frame("TEST", df, "XNYS",
+                                 is_complete=lambda day, ts: data_fetchers.minute_day_complete(ts, "XNYS", day))
+    assert written == 1
+    assert store.has_day("TEST", date(2026, 10, 15)) and not store.has_day("TEST", date(2026, 10, 16))
+    assert not data_fetchers.minute_frame_complete(df, "XNYS", date(2026, 10, 16))
+
+
+def test_lunch_break_is_neither_missing_nor_extreme():
+    day = date(2026, 10, 16)
+    idx = pd.date_range(f"{day} 09:00", f"{day} 15:29", freq="1min", tz="Asia/Tokyo")
+    df = pd.DataFrame({"High": 1.0, "Low": 1.0}, index=idx)
+    df.loc[idx[3], "High"] = 2.0                                      # 09:03，开盘后半小时内
+    df.loc[pd.Timestamp(f"{day} 12:00", tz="Asia/Tokyo"), "Low"] = 0.0  # 午休中的脏数据
+    df.loc[pd.Timestamp(f"{day} 14:00", tz="Asia/Tokyo"), "Low"] = 0.5
+    assert extract_stock_high_low_time(df, day, "XTKS") == ("09:03", "14:00")
+
+    breaks = session_breaks_ms("XTKS", day)
+    start_ms = int(idx[0].tz_convert("UTC").value // 1_000_000)
+    end_ms = start_ms + len(idx) * MINUTE_MS
+    session = df[(df.index.time < pd.Timestamp("11:30").time()) | (df.index.time >= pd.Timestamp("12:30").time())]
+    have = session.index.tz_convert("UTC").as_unit("ms").asi8
+    assert _missing_ranges(have, start_ms, end_ms, breaks) == []
+
+
+class _FakeTicker:
+    """假 yfinance：按请求区间返回分钟线，HOLES 中的分钟上游不存在；日线始终可用。"""
+
+    HOLES = set()
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def history(self, start=None, end=None, interval="1d", period=None, **kwargs):
+        if interval == "1d":
+            idx = pd.date_range("2026-10-12", periods=5, freq="D", tz="America/New_York")
+            return pd.DataFrame({"Open": 1.0, "High": 2.0, "Low": 0.5, "Close": 1.5}, index=idx)
+        idx = pd.date_range(start, end, freq="1min", inclusive="left")
+        idx = idx[[i not in self.HOLES for i in range(len(idx))]] if len(idx) > 300 else \
+            idx[[False] * len(idx)]  # 补拉缺口时上游同样没有这些分钟
+        return pd.DataFrame({"High": 1.0, "Low": 1.0}, index=idx)
+
+
+def test_empty_gap_refetch_does_not_trip_breaker(monkeypatch):
+    import sys
+    import types
+    import utils
+
+    monkeypatch.setitem(sys.modules, "yfinance", types.SimpleNamespace(Ticker=_FakeTicker))
+    monkeypatch.setattr(utils, "_breakers", {})
+    monkeypatch.setattr(utils, "_backoff_delay", lambda attempt: pytest.fail("空区间不应退避重试"))
+    monkeypatch.setattr(data_fetchers, "get_session_close", lambda calendar, day: None)
+    monkeypatch.setattr(data_fetchers, "MINUTE_GAP_MAX_ROUNDS", 3)
+    monkeypatch.setattr(_FakeTicker, "HOLES", {5, 17, 100, 101, 200, 250, 300})
+
+    high_t, low_t, complete = data_fetchers.fetch_stock_1m_high_low_time("SPY", date(2026, 10, 16), "XNYS")
+    assert high_t and low_t and complete
+    assert utils.get_circuit_breaker("yf").allow()
+    assert data_fetchers.fetch_yf_history("QQQ") is not None
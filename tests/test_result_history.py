@@ -0,0 +1,81 @@
+# test_result_history.py
+import random
+
+import pandas as pd
+import pytest
+
+from models import DailyResult
+from result_history import ResultHistory, history_keys
+
+
+def _result(day, high, low, close_pct, amplitude, name="X"):
+    return DailyResult(name, high, "", 0.0, low, "", 0.0, high, close_pct, amplitude, "index",
+                       f"{day:%Y-%m-%d}（周一）")
+
+
+def _check(summary, history):
+    for w in (5, 20):
+        if len(history) >= w:
+            assert summary[f"avg_amplitude_{w}"] == pytest.approx(
+                sum(r.amplitude_pct for r in history[-w:]) / w, abs=0.011)
+        else:
+            assert f"avg_amplitude_{w}" not in summary
+    full = len(history) >= 20
+    assert summary["new_high"] == (full and history[-1].high >= max(r.high for r in history[-20:]))
+    assert summary["new_low"] == (full and history[-1].low <= min(r.low for r in history[-20:]))
+    streak = 0
+    for r in history:
+        if r.close_pct > 0:
+            streak = streak + 1 if streak > 0 else 1
+        elif r.close_pct < 0:
+            streak = streak - 1 if streak < 0 else -1
+        else:
+            streak = 0
+    assert summary["streak"] == streak
+
+
+def test_incremental_state_matches_recomputation(tmp_path):
+    rng = random.Random(1)
+    history = ResultHistory(str(tmp_path / "history.sqlite"))
+    seen = []
+    for i, day in enumerate(pd.bdate_range("2026-01-01", periods=80)):
+        high = float(rng.randint(90, 110))          # 取整制造相同的最高/最低
+        r = _result(day, high, high - rng.randint(0, 5), rng.choice([-1.0, 1.0, 0.5, -0.3, 0.0]),
+                    rng.uniform(0, 5))
+        seen.append(r)
+        summary = history.update([r])["X"]
+        if i % 7 == 3:
+            summary = history.update([r])["X"]      # 同一交易日重跑不重复计数
+        _check(summary, seen)
+
+    # 重新打开后从持久化的状态继续
+    reopened = ResultHistory(str(tmp_path / "history.sqlite"))
+    day = pd.Timestamp("2026-06-01")
+    seen.append(_result(day, 200.0, 1.0, 2.0, 3.0))
+    _check(reopened.update([seen[-1]])["X"], seen)
+
+
+def test_stale_and_older_sessions(tmp_path):
+    history = ResultHistory(str(tmp_path / "history.sqlite"))
+    days = pd.bdate_range("2026-03-02", periods=6)
+    for day in days[1:]:
+        history.update([_result(day, 10.0, 9.0, 1.0, 1.0)])
+
+    stale = DailyResult("X", None, "", None, None, "", None, None, None, None, "index", "", "stale")
+    assert history.update([stale]) == {}
+    # 回填更早的交易日：写入并重放，但不返回（已不是最新的）摘要
+    assert history.update([_result(days[0], 10.0, 9.0, -1.0, 2.0)]) == {}
+    summary = history.update([_result(days[-1], 10.0, 9.0, 1.0, 1.0)])["X"]
+    assert summary["avg_amplitude_5"] == pytest.approx(1.0)
+    assert summary["streak"] == 5
+
+
+def test_history_follows_instrument_not_plan_name(tmp_path):
+    history = ResultHistory(str(tmp_path / "history.sqlite"))
+    days = pd.bdate_range("2026-03-02", periods=3)
+    spy = {"source": "yf", "symbol": "SPY"}
+    # 档案顺序变化后同一标的的计划名称从 SPY#2 变为 SPY，统计仍应连续
+    for day, name in zip(days, ["SPY#2", "SPY", "SPY#2"]):
+        summary = history.update([_result(day, 10.0, 9.0, 1.0, 1.0, name=name)],
+                                 history_keys({name: spy}))[name]
+    assert summary["streak"] == 3
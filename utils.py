@@ -1,19 +1,105 @@
 # utils.py
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import random
+import threading
 import pandas as pd
 import pytz
 import time as time_module
 from datetime import date, datetime, time
-import exchange_calendars as xcals
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
-from config import CALENDAR_TIMEZONES, CLOSE_BUFFER_MINUTES
+import metrics
+from config import (
+    CALENDAR_TIMEZONES, CLOSE_BUFFER_MINUTES,
+    CALENDAR_SNAPSHOT_DIR, CALENDAR_SNAPSHOT_TTL_DAYS, CALENDAR_SNAPSHOT_LOOKBACK_DAYS,
+    CALENDAR_SNAPSHOT_LOOKAHEAD_DAYS,
+    RUN_DEADLINE_SECONDS, FETCH_TIME_BUDGET_SECONDS, RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_SECONDS, MINUTE_SESSION_HOURS, MINUTE_SESSION_BREAKS,
+    SOURCE_CONCURRENCY, DEFAULT_SOURCE_CONCURRENCY, MAX_FETCH_WORKERS,
+)
 
-CALENDARS = {
-    "XNYS": xcals.get_calendar("XNYS"),
-    "XHKG": xcals.get_calendar("XHKG"),
-    "XSHG": xcals.get_calendar("XSHG"),
-    "XTKS": xcals.get_calendar("XTKS"),
-}
+# exchange_calendars 构建日历对象需要数秒，只在快照缺失或过期时才构建
+_calendars: Dict[str, object] = {}
+_snapshots: Dict[str, Dict] = {}
+_calendar_lock = threading.Lock()
+
+
+def get_calendar(calendar_name: str):
+    with _calendar_lock:
+        if calendar_name not in _calendars:
+            import exchange_calendars as xcals
+            _calendars[calendar_name] = xcals.get_calendar(calendar_name)
+        return _calendars[calendar_name]
+
+
+def _snapshot_path(calendar_name: str) -> str:
+    return os.path.join(CALENDAR_SNAPSHOT_DIR, f"{calendar_name}.json")
+
+
+def _build_snapshot(calendar_name: str) -> Dict:
+    cal = get_calendar(calendar_name)
+    today = pd.Timestamp.now(tz="UTC").tz_localize(None).normalize()
+    start = max(today - pd.Timedelta(days=CALENDAR_SNAPSHOT_LOOKBACK_DAYS), cal.first_session)
+    end = min(today + pd.Timedelta(days=CALENDAR_SNAPSHOT_LOOKAHEAD_DAYS), cal.last_session)
+
+    schedule = cal.schedule.loc[start:end]
+    close_col = "market_close" if "market_close" in schedule.columns else "close"
+    closes = schedule[close_col]
+    if closes.dt.tz is None:
+        closes = closes.dt.tz_localize(CALENDAR_TIMEZONES.get(calendar_name, "UTC"))
+    closes = closes.dt.tz_convert("UTC")
+
+    return {
+        "built_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "sessions": [session.date().isoformat() for session in schedule.index],
+        "closes": [close.isoformat() for close in closes],
+    }
+
+
+def _snapshot_valid(snapshot: Dict) -> bool:
+    now = pd.Timestamp.now(tz="UTC")
+    built_at = pd.Timestamp(snapshot.get("built_at"))
+    if now - built_at > pd.Timedelta(days=CALENDAR_SNAPSHOT_TTL_DAYS):
+        return False
+    sessions = snapshot.get("sessions") or []
+    # 快照必须覆盖今天之后至少一个交易日
+    return bool(sessions) and sessions[-1] > now.date().isoformat()
+
+
+def _load_snapshot(calendar_name: str) -> Dict:
+    """读取交易日/收盘时间快照（内存 → 磁盘 → 重新构建），返回已解析的日期与 UTC 收盘时间。"""
+    with _calendar_lock:
+        snapshot = _snapshots.get(calendar_name)
+    if snapshot is not None and _snapshot_valid(snapshot):
+        return snapshot
+
+    snapshot = None
+    path = _snapshot_path(calendar_name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        snapshot = None
+
+    if snapshot is None or not _snapshot_valid(snapshot):
+        print(f"→ 重建 {calendar_name} 交易日历快照")
+        snapshot = _build_snapshot(calendar_name)
+        os.makedirs(CALENDAR_SNAPSHOT_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    snapshot["_dates"] = [date.fromisoformat(s) for s in snapshot["sessions"]]
+    snapshot["_closes"] = [pd.Timestamp(c) for c in snapshot["closes"]]
+    with _calendar_lock:
+        _snapshots[calendar_name] = snapshot
+    return snapshot
 
 def format_date_display(d: date) -> str:
     weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
@@ -23,61 +109,252 @@ def get_local_now(calendar_name: Optional[str]) -> pd.Timestamp:
     tz = CALENDAR_TIMEZONES.get(calendar_name, "UTC")
     return pd.Timestamp.now(tz=tz)
 
+# 同一次运行内按 (日历, 数据源) 缓存已完成交易日，各标的共用一次计算，也保证整次运行口径一致
+_session_cache: Dict[Tuple[Optional[str], str], Optional[date]] = {}
+_session_cache_lock = threading.Lock()
+
+
 def get_latest_completed_session(calendar_name: Optional[str], source: str) -> Optional[date]:
-    if not calendar_name or calendar_name not in CALENDARS:
+    key = (calendar_name, source)
+    with _session_cache_lock:
+        if key in _session_cache:
+            return _session_cache[key]
+    with metrics.stage("session_lookup", source=source):
+        metrics.annotate(calendar=calendar_name)
+        completed = _latest_completed_session(calendar_name, source)
+    with _session_cache_lock:
+        return _session_cache.setdefault(key, completed)
+
+
+def _latest_completed_session(calendar_name: Optional[str], source: str) -> Optional[date]:
+    if not calendar_name or calendar_name not in CALENDAR_TIMEZONES:
         # 无日历时保守返回前一天
         return (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=1)).date()
 
-    cal = CALENDARS[calendar_name]
+    snapshot = _load_snapshot(calendar_name)
+    sessions: List[date] = snapshot["_dates"]
+    closes: List[pd.Timestamp] = snapshot["_closes"]
+
     local_now = get_local_now(calendar_name)                    # tz-aware，本地时区
     now_utc_aware = local_now.tz_convert("UTC")                 # tz-aware UTC
-    now_utc_naive = now_utc_aware.tz_localize(None)             # tz-naive UTC，用于与 sessions 比较
 
-    sessions = cal.sessions  # tz-naive UTC DatetimeIndex
-
-    # 使用 tz-naive 的时间进行 searchsorted
-    idx = sessions.searchsorted(now_utc_naive, side="right") - 1
+    # 交易日按 UTC 日期比较，与 exchange_calendars 的 tz-naive sessions 语义一致
+    idx = bisect.bisect_right(sessions, now_utc_aware.date()) - 1
     if idx < 0:
         return None
 
-    session = sessions[idx]
-    schedule = cal.schedule.loc[session]
-
-    # close_time 是本地时区（可能 naive 或 aware）
-    close_time = schedule.get("market_close") or schedule.get("close")
-    if close_time.tzinfo is None:
-        close_time = close_time.tz_localize(CALENDAR_TIMEZONES.get(calendar_name, "UTC"))
-
-    close_time_utc = close_time.tz_convert("UTC")
+    close_time_utc = closes[idx]
     buffer = pd.Timedelta(minutes=CLOSE_BUFFER_MINUTES.get(source, 30))
 
     # 判断是否已过收盘 + buffer（使用 aware 时间比较）
     if now_utc_aware >= close_time_utc + buffer:
-        return session.date()  # 当日已完成
+        return sessions[idx]  # 当日已完成
 
     # 未完成，回退到前一个交易日
-    prev = cal.previous_session(session)
-    return prev.date() if prev else None
+    return sessions[idx - 1] if idx > 0 else None
+
+
+def get_session_close(calendar_name: Optional[str], session: date) -> Optional[pd.Timestamp]:
+    """返回指定交易日的收盘时间（UTC）；非交易日或超出快照范围时返回 None。"""
+    if not calendar_name or calendar_name not in CALENDAR_TIMEZONES:
+        return None
+    snapshot = _load_snapshot(calendar_name)
+    idx = bisect.bisect_left(snapshot["_dates"], session)
+    if idx < len(snapshot["_dates"]) and snapshot["_dates"][idx] == session:
+        return snapshot["_closes"][idx]
+    return None
+
+
+def session_mask(index: pd.DatetimeIndex, calendar_name: Optional[str]):
+    """交易所本地时间的分钟线索引中，属于常规交易时段（剔除盘前盘后和午休）的布尔掩码。"""
+    start, end = MINUTE_SESSION_HOURS.get(calendar_name, ("09:30", "16:00"))
+    t = index.time
+    mask = (t >= time.fromisoformat(start)) & (t <= time.fromisoformat(end))
+    for break_start, break_end in MINUTE_SESSION_BREAKS.get(calendar_name, []):
+        mask &= ~((t >= time.fromisoformat(break_start)) & (t < time.fromisoformat(break_end)))
+    return mask
+
+
+def session_breaks_ms(calendar_name: Optional[str], session: date) -> List[Tuple[int, int]]:
+    """指定交易日的午休区间，UTC 毫秒 [起, 止)。"""
+    tz = CALENDAR_TIMEZONES.get(calendar_name, "America/New_York")
+    return [
+        (int(pd.Timestamp(f"{session} {a}", tz=tz).tz_convert("UTC").value // 1_000_000),
+         int(pd.Timestamp(f"{session} {b}", tz=tz).tz_convert("UTC").value // 1_000_000))
+        for a, b in MINUTE_SESSION_BREAKS.get(calendar_name, [])
+    ]
+
 
+def next_session_close(calendar_name: str, after: pd.Timestamp) -> Optional[pd.Timestamp]:
+    """返回严格晚于 after（tz-aware）的下一个收盘时间（UTC），超出快照范围时返回 None。"""
+    closes: List[pd.Timestamp] = _load_snapshot(calendar_name)["_closes"]
+    idx = bisect.bisect_right(closes, after)
+    return closes[idx] if idx < len(closes) else None
+
+
+class CircuitBreaker:
+    """单个数据源的熔断器：连续失败达到阈值后熔断，冷却期内该源的请求直接判定失败。"""
+
+    def __init__(self, source: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown_seconds: float = CIRCUIT_COOLDOWN_SECONDS):
+        self.source = source
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time_module.monotonic() - self._opened_at >= self.cooldown_seconds:
+                # 冷却结束（半开）：放行一次试探请求，失败会立即再次熔断
+                self._opened_at = None
+                self._failures = self.failure_threshold - 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold and self._opened_at is None:
+                self._opened_at = time_module.monotonic()
+                print(f"→ 数据源 {self.source} 连续失败 {self._failures} 次，已熔断 {self.cooldown_seconds:.0f} 秒")
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breaker_lock = threading.Lock()
+_run_deadline: Optional[float] = None
+
+
+def get_circuit_breaker(source: str) -> CircuitBreaker:
+    with _breaker_lock:
+        if source not in _breakers:
+            _breakers[source] = CircuitBreaker(source)
+        return _breakers[source]
+
+
+def start_run_deadline(seconds: Optional[float] = RUN_DEADLINE_SECONDS):
+    """开始新一次运行：设置总截止时间（之后所有 retry_fetch 都不会跨过它继续重试），并清空已完成交易日缓存。"""
+    global _run_deadline
+    with _session_cache_lock:
+        _session_cache.clear()
+    _run_deadline = time_module.monotonic() + seconds if seconds else None
+
+
+# 对冲请求中落败的一方通过该事件取消：retry_fetch 在每次尝试前和退避等待中检查，不再发起新的请求
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("cancel_event", default=None)
+
+
+@contextlib.contextmanager
+def cancellable(event: threading.Event):
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+_source_slots: Dict[str, threading.BoundedSemaphore] = {}
+_source_slots_lock = threading.Lock()
+
+
+def get_source_slots(source: str) -> threading.BoundedSemaphore:
+    """每个数据源同时进行的上游请求数上限；对冲、回填等不经过该源线程池的请求同样受限。"""
+    with _source_slots_lock:
+        if source not in _source_slots:
+            limit = min(SOURCE_CONCURRENCY.get(source, DEFAULT_SOURCE_CONCURRENCY), MAX_FETCH_WORKERS)
+            _source_slots[source] = threading.BoundedSemaphore(limit)
+        return _source_slots[source]
+
+
+def _acquire_slot(slots: threading.BoundedSemaphore, cancel: Optional[threading.Event],
+                  deadline: Optional[float]) -> bool:
+    # 分段等待，以便及时响应取消和时间预算
+    while not slots.acquire(timeout=0.1):
+        if (cancel is not None and cancel.is_set()) or \
+                (deadline is not None and time_module.monotonic() >= deadline):
+            return False
+    return True
+
+
+def _backoff_delay(attempt: int) -> float:
+    # 指数退避 + full jitter，避免并发请求同时重试
+    cap = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(0, cap)
+
+
+def retry_fetch(func, *args, success_msg: str = "获取成功", max_retries: int = 5, min_rows: int = 2,
+                source: Optional[str] = None, budget: Optional[float] = FETCH_TIME_BUDGET_SECONDS, **kwargs):
+    breaker = get_circuit_breaker(source) if source else None
+    slots = get_source_slots(source) if source else None
+    cancel = _cancel_event.get()
+    deadline = time_module.monotonic() + budget if budget else None
+    if _run_deadline is not None:
+        deadline = _run_deadline if deadline is None else min(deadline, _run_deadline)
 
-def retry_fetch(func, *args, success_msg: str = "获取成功", max_retries: int = 5, **kwargs):
-    delays = [2, 1, 3, 4, 5, 2, 4]
     for attempt in range(1, max_retries + 1):
+        if cancel is not None and cancel.is_set():
+            print("→ 请求已被对冲请求取消")
+            return None
+        if breaker is not None and not breaker.allow():
+            print(f"→ 数据源 {source} 熔断中，跳过请求")
+            return None
+        if deadline is not None and time_module.monotonic() >= deadline:
+            print(f"→ 获取超出时间预算，放弃（已尝试 {attempt - 1} 次）")
+            return None
+
+        if slots is not None and not _acquire_slot(slots, cancel, deadline):
+            print(f"→ 等待数据源 {source} 并发名额时被取消或超出时间预算")
+            return None
         try:
             result = func(*args, **kwargs)
-            if result is not None and (
-                (isinstance(result, pd.DataFrame) and len(result) >= 2) or
-                (isinstance(result, tuple) and all(item is not None for item in result))
-            ):
-                print(f"→ {success_msg}（第 {attempt} 次尝试）")
-                return result
         except Exception as e:
             print(f"  → 重试第 {attempt} 次失败: {type(e).__name__}: {e}")
+            result = None
+        finally:
+            if slots is not None:
+                slots.release()
+        if result is not None and (
+            (isinstance(result, pd.DataFrame) and len(result) >= min_rows) or
+            (isinstance(result, tuple) and all(item is not None for item in result))
+        ):
+            print(f"→ {success_msg}（第 {attempt} 次尝试）")
+            # 行数/字节数只在这一层累加；上游库不暴露响应体大小，以数据帧内存占用近似
+            if isinstance(result, pd.DataFrame):
+                metrics.add("rows", len(result))
+                metrics.add("bytes", int(result.memory_usage(deep=True).sum()))
+            else:
+                metrics.add("rows", 1)
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+        if breaker is not None:
+            breaker.record_failure()
 
         if attempt < max_retries:
-            sleep_time = delays[min(attempt - 1, len(delays) - 1)]
-            print(f"    等待 {sleep_time} 秒后重试...")
-            time_module.sleep(sleep_time)
+            metrics.add("retries", 1)
+            sleep_time = _backoff_delay(attempt)
+            if deadline is not None and time_module.monotonic() + sleep_time >= deadline:
+                print(f"→ 获取超出时间预算，放弃（已尝试 {attempt} 次）")
+                return None
+            print(f"    等待 {sleep_time:.1f} 秒后重试...")
+            if cancel is not None:
+                cancel.wait(sleep_time)
+            else:
+                time_module.sleep(sleep_time)
 
     print(f"→ 获取彻底失败（已重试 {max_retries} 次）")
-    return None
\ No newline at end of file
+    return None
+
+
+async def retry_fetch_async(func, *args, **kwargs):
+    """供 asyncio 调用方使用：在线程中执行 retry_fetch，不阻塞事件循环。"""
+    return await asyncio.to_thread(retry_fetch, func, *args, **kwargs)
@@ -1,8 +1,85 @@
 # main.py
+import argparse
+import contextlib
+import sys
+from datetime import date
+
+import metrics
+from config import MARKETS, METRICS_JSONL_PATH, METRICS_PROM_PATH, HISTORY_ENABLED
 from processor import collect_data, post_process
-from reporter import render_report
+from reporter import render_report, TextSink, MarkdownSink, JsonSink, HtmlSink
+
+SINKS = {"text": TextSink, "md": MarkdownSink, "json": JsonSink, "html": HtmlSink}
+
+
+def run_daily(sinks=None):
+    with metrics.stage("collect"):
+        raw_results, crypto_date, us_date = collect_data()
+    with metrics.stage("post_process"):
+        ordered_results = post_process(raw_results)
+    rolling = None
+    if HISTORY_ENABLED:
+        from result_history import get_result_history, history_keys
+        with metrics.stage("history"):
+            rolling = get_result_history().update(ordered_results, history_keys(MARKETS))
+    with metrics.stage("render"):
+        render_report(ordered_results, crypto_date, us_date, sinks=sinks, rolling=rolling)
+
+
+def _parse_output(value: str):
+    fmt, sep, path = value.partition("=")
+    if not sep or fmt not in SINKS:
+        raise argparse.ArgumentTypeError(f"格式应为 FORMAT=PATH，FORMAT 取 {'/'.join(SINKS)}")
+    return fmt, path
+
 
 if __name__ == "__main__":
-    raw_results, crypto_date, us_date = collect_data()
-    ordered_results = post_process(raw_results)
-    render_report(ordered_results, crypto_date, us_date)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="市场日报")
+    parser.add_argument("--backfill", nargs=2, metavar=("START", "END"), type=date.fromisoformat,
+                        help="回填 START 至 END（YYYY-MM-DD）之间每个交易日的日报")
+    parser.add_argument("--stream", action="store_true", help="常驻订阅 Binance 1m K 线，流式聚合加密货币日内高低点")
+    parser.add_argument("--daemon", action="store_true", help="常驻运行，各市场收盘后自动更新日报")
+    parser.add_argument("--report-profiles", nargs="*", metavar="NAME",
+                        help="一次生成 config.REPORT_PROFILES 中的多份日报（不指定名称则全部），相同标的只获取一次")
+    parser.add_argument("--metrics-jsonl", default=METRICS_JSONL_PATH, help="按阶段/标的输出 JSON lines 指标")
+    parser.add_argument("--metrics-prom", default=METRICS_PROM_PATH, help="输出 Prometheus textfile 指标")
+    parser.add_argument("--profile", help="用 cProfile 运行并把统计结果写入该文件")
+    parser.add_argument("--output", action="append", type=_parse_output, default=[], metavar="FORMAT=PATH",
+                        help="额外输出一份日报（text/md/json/html），可重复指定；标准输出始终为纯文本。"
+                             "json 每份日报一行，--backfill 时为每个交易日一行的 JSON Lines")
+    args = parser.parse_args()
+
+    def open_sinks(stack: contextlib.ExitStack):
+        return [TextSink(sys.stdout)] + [
+            SINKS[fmt](stack.enter_context(open(path, "w", encoding="utf-8"))) for fmt, path in args.output
+        ]
+
+    with contextlib.ExitStack() as stack:
+        if args.stream:
+            from crypto_stream import run_stream
+            target, target_args = run_stream, ()
+        elif args.daemon:
+            from daemon import ReportDaemon
+            # 常驻模式下每次更新都重新打开并整份重写输出文件
+            flush_metrics = lambda: metrics.flush(args.metrics_jsonl, args.metrics_prom)
+            target, target_args = ReportDaemon(sinks_factory=open_sinks, flush_metrics=flush_metrics).run_forever, ()
+        elif args.report_profiles is not None:
+            from planner import load_profiles, run_profiles
+
+            def open_profile_sinks(profile, profile_stack: contextlib.ExitStack):
+                return [SINKS[fmt](profile_stack.enter_context(open(path, "w", encoding="utf-8")))
+                        for fmt, path in profile.outputs]
+            target, target_args = run_profiles, (load_profiles(args.report_profiles), open_profile_sinks)
+        elif args.backfill:
+            from backfill import run_backfill
+            target, target_args = run_backfill, (*args.backfill, open_sinks(stack))
+        else:
+            target, target_args = run_daily, (open_sinks(stack),)
+
+        try:
+            if args.profile:
+                metrics.profile_run(target, args.profile, *target_args)
+            else:
+                target(*target_args)
+        finally:
+            metrics.flush(args.metrics_jsonl, args.metrics_prom)